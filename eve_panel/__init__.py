@@ -16,18 +16,32 @@ Todo:
 __author__ = """Yossi Mosbacher"""
 __email__ = 'joe.mosbacher@gmail.com'
 __version__ = '0.3.28'
-import panel as pn
-
 from .auth import EveAuthBase
 from .eve_client import EveClient
 from .item import EveItem
+from .record import EveRecord
 from .resource import EveResource
 # from .utils import from_app_config
-from .menu import Menu, css
-from .web_client import EveWebClient
+
+# GUI modules are only imported when first accessed
+_LAZY_ATTRIBUTES = {
+    "Menu": "menu",
+    "css": "menu",
+    "EveWebClient": "web_client",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def extension():
+   import panel as pn
+   from .menu import css
    pn.extension('ace')
    pn.config.raw_css.append(css)
    try:
@@ -36,4 +50,4 @@ def extension():
    except ImportError:
       print("Cannot import holoviews, plotting will not work.")
 
-notebook = output_notebook = extension
\ No newline at end of file
+notebook = output_notebook = extension
@@ -0,0 +1,157 @@
+"""
+Arrow IO
+========
+Conversion of Eve schemas and documents to Apache Arrow.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from .columnar import EVE_DATE_FORMAT, field_schema
+from .types import base64_to_binary
+from .utils import NumpyJSONENncoder
+
+
+def import_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("pyarrow is not installed.")
+    return pa
+
+
+def _primitive_types(pa):
+    return {
+        "objectid": pa.string(),
+        "boolean": pa.bool_(),
+        "binary": pa.binary(),
+        "date": pa.timestamp("us", tz="UTC"),
+        "datetime": pa.timestamp("us", tz="UTC"),
+        "float": pa.float64(),
+        "integer": pa.int64(),
+        "number": pa.float64(),
+        "string": pa.string(),
+        "media": pa.binary(),
+    }
+
+
+def arrow_type(schema):
+    """Arrow data type of an Eve field.
+    dicts with a schema become structs, dicts with valuesrules maps
+    and lists/sets with a schema lists. Free form dicts and lists are
+    stored as json strings.
+
+    Args:
+        schema (dict): Eve schema of the field
+
+    Returns:
+        pyarrow.DataType: type of the field
+    """
+    pa = import_pyarrow()
+    kind = schema.get("type", "string")
+    if kind == "dict" and isinstance(schema.get("schema"), dict):
+        return pa.struct([pa.field(k, arrow_type(v)) for k, v in schema["schema"].items()])
+    if kind == "dict" and isinstance(schema.get("valuesrules"), dict):
+        return pa.map_(pa.string(), arrow_type(schema["valuesrules"]))
+    if kind in ("list", "set") and isinstance(schema.get("schema"), dict):
+        return pa.list_(arrow_type(schema["schema"]))
+    value_type = _primitive_types(pa).get(kind, pa.string())
+    if "allowed" in schema and kind in ("string", "integer"):
+        return pa.dictionary(pa.int32(), value_type)
+    return value_type
+
+
+def arrow_schema(schema, fields):
+    """Arrow schema of the given fields of an Eve resource.
+
+    Args:
+        schema (dict): Eve schema of the resource
+        fields (list): fields to include, meta fields such as _id are allowed.
+
+    Returns:
+        pyarrow.Schema: schema with one column per field
+    """
+    pa = import_pyarrow()
+    return pa.schema([pa.field(name, arrow_type(field_schema(schema, name))) for name in fields])
+
+
+def parse_date(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, EVE_DATE_FORMAT)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def to_json_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, cls=NumpyJSONENncoder)
+
+
+def python_value(value, schema):
+    """Prepare a nested value for conversion to its arrow type.
+    """
+    if value is None:
+        return None
+    kind = schema.get("type", "string")
+    if kind in ("date", "datetime"):
+        return parse_date(value)
+    if kind in ("binary", "media"):
+        return base64_to_binary(value)
+    if kind == "dict" and isinstance(schema.get("schema"), dict):
+        return {k: python_value(value.get(k), v) for k, v in schema["schema"].items()}
+    if kind == "dict" and isinstance(schema.get("valuesrules"), dict):
+        return [(k, python_value(v, schema["valuesrules"])) for k, v in value.items()]
+    if kind in ("list", "set") and isinstance(schema.get("schema"), dict):
+        return [python_value(v, schema["schema"]) for v in value]
+    if kind in ("dict", "list", "set"):
+        return to_json_string(value)
+    return value
+
+
+def to_array(values, schema, type_):
+    """Convert the values of one field to an arrow array.
+
+    Args:
+        values (list): field values, missing values as None
+        schema (dict): Eve schema of the field
+        type_ (pyarrow.DataType): target type
+
+    Returns:
+        pyarrow.Array: array of type type_
+    """
+    pa = import_pyarrow()
+    kind = schema.get("type", "string")
+    if kind in ("date", "datetime") and all(v is None or isinstance(v, str) for v in values):
+        import pyarrow.compute as pc
+        strings = pa.array(values, type=pa.string())
+        try:
+            naive = pc.strptime(strings, format=EVE_DATE_FORMAT, unit="us")
+            return naive.cast(type_)
+        except pa.ArrowInvalid:
+            pass
+    if pa.types.is_struct(type_) or pa.types.is_map(type_) or pa.types.is_list(type_) \
+        or kind not in _primitive_types(pa) or kind in ("date", "datetime", "binary", "media"):
+        values = [python_value(v, schema) for v in values]
+    return pa.array(values, type=type_)
+
+
+def to_record_batch(docs, schema, fields):
+    """Convert a page of documents to an arrow RecordBatch.
+
+    Args:
+        docs (list): documents as returned by the server
+        schema (dict): Eve schema of the resource
+        fields (list): fields to include
+
+    Returns:
+        pyarrow.RecordBatch: one row per document
+    """
+    pa = import_pyarrow()
+    target = arrow_schema(schema, fields)
+    arrays = [
+        to_array([doc.get(field.name) for doc in docs], field_schema(schema, field.name), field.type)
+        for field in target
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=target)
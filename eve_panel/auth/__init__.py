@@ -3,8 +3,8 @@ auth module
 ====================================
 Authentication and Authorization handling
 """
-import pkg_resources
 import logging
+from importlib.metadata import entry_points
 
 from .base import EveAuthBase, EveNoAuth
 from .basic_auth import EveBasicAuth
@@ -23,12 +23,17 @@ AUTH_CLASSES = {
     "Oauth2 Device Flow": Oauth2DeviceFlow,
 }
 
-for entry_point in pkg_resources.iter_entry_points('eve_panel.auth'):
+def _auth_entry_points():
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        return eps.select(group='eve_panel.auth')
+    return eps.get('eve_panel.auth', [])
+
+for entry_point in _auth_entry_points():
     try:
         AUTH_CLASSES[entry_point.name] = entry_point.load()
     except Exception as e:
         log.warning(f'Could not load {entry_point.name}.')
         log.debug(str(e))
-import pkg_resources
 
 DEFAULT_AUTH = None
\ No newline at end of file
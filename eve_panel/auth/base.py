@@ -1,6 +1,5 @@
 import logging
 import param
-import panel as pn
 
 from ..eve_model import EveModelBase
 from ..settings import config as settings
@@ -92,6 +91,7 @@ class EveNoAuth(EveAuthBase):
         return True
 
     def credentials_view(self):
+        import panel as pn
         return pn.Row()
 
     @property
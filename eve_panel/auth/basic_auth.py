@@ -1,7 +1,6 @@
 
 
 import base64
-import panel as pn
 import param
 import getpass
 import logging
@@ -48,6 +47,7 @@ class EveBasicAuth(EveAuthBase):
         return {"Authorization": f"Basic {self.token}"}
 
     def make_panel(self):
+        import panel as pn
         return pn.Param(self.param,
                         max_width=self.max_width,
                         max_height=self.max_height,
@@ -56,6 +56,7 @@ class EveBasicAuth(EveAuthBase):
                         widgets={"password": pn.widgets.PasswordInput})
 
     def credentials_view(self):
+        import panel as pn
         return pn.Param(self.param,
                         parameters=["username", "password"],
                         widgets={"password": pn.widgets.PasswordInput},
@@ -2,7 +2,6 @@
 
 
 import base64
-import panel as pn
 import param
 import getpass
 import logging
@@ -42,6 +41,7 @@ class EveBearerAuth(EveAuthBase):
         return bool(self.token)
 
     def make_panel(self):
+        import panel as pn
         return pn.panel(self.param.token,
                         max_width=self.max_width,
                         max_height=self.max_height,
@@ -1,6 +1,5 @@
 
 import base64
-import panel as pn
 import param
 import getpass
 import time
@@ -38,6 +37,7 @@ class Oauth2DeviceFlow(EveAuthBase):
         return f"{self.auth_server_uri.strip('/')}/{self.verification_path.strip('/')}?user_code={self.user_code}"
     
     def initiate_flow(self):
+        import panel as pn
         data = {}
         with self.get_client() as client:
             try:
@@ -66,6 +66,7 @@ class Oauth2DeviceFlow(EveAuthBase):
         return webbrowser.open(self.authorize_url)
     
     def authorize_link(self):
+        import panel as pn
         html_pane = pn.pane.HTML(f"""
         <a id="log-in-link" class="nav-link" href="{self.authorize_url}" target="_blank">
          Authorize 
@@ -115,6 +116,7 @@ class Oauth2DeviceFlow(EveAuthBase):
             
     @param.depends("_cb", "token")            
     def credentials_view(self):
+        import panel as pn
         init_flow_button = pn.widgets.Button(name="Generate",
                                              button_type="primary",
                                             width=70)
@@ -132,6 +134,7 @@ class Oauth2DeviceFlow(EveAuthBase):
         return pn.Column(params, buttons, sizing_mode="stretch_width", width=300)
     
     def perform_flow(self):
+        import panel as pn
         self.initiate_flow()
         return pn.Column(self.view)
         
@@ -155,6 +158,7 @@ class Oauth2DeviceFlow(EveAuthBase):
         self.token = ""
         
     def make_panel(self):
+        import panel as pn
         return pn.panel(self.credentials_view)
     
     def __getstate__(self):
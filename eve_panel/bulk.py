@@ -0,0 +1,369 @@
+"""
+Bulk
+====
+Chunked, concurrent inserts with per-document results.
+Documents are split into chunks bounded by count and encoded size,
+chunks are posted concurrently and failures are resolved per chunk:
+
+* documents the server rejected are reported with their issues,
+* valid documents of a rejected chunk (Eve inserts nothing from it)
+  are sent again without the rejected ones,
+* chunks too large for the server are split in two,
+* requests that could not connect, 429 and 503 responses are retried
+  with backoff. POST is not idempotent, after other failures the
+  documents may have been inserted and are reported as rejected.
+
+Documents with media fields are sent one multipart request each,
+see :class:`MediaUpload`.
+"""
+
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+from .exceptions import ServerError
+from .media import MediaHandle
+from .settings import config as settings
+from .utils import NumpyJSONENncoder
+
+RETRY_STATUS = (429, 503)
+# the request never reached the server
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def encode(doc):
+    return json.dumps(doc, cls=NumpyJSONENncoder).encode()
+
+
+def chunk_documents(docs, chunk_size=None, max_bytes=None):
+    """Split documents into chunks of at most chunk_size documents and
+    max_bytes of encoded JSON. A document larger than max_bytes is sent alone.
+
+    Yields:
+        list: chunks of (document, encoded document) pairs
+    """
+    chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+    max_bytes = max_bytes or settings.BULK_MAX_BYTES
+    chunk, nbytes = [], 2
+    for doc in docs:
+        data = encode(doc)
+        if chunk and (len(chunk) >= chunk_size or nbytes + len(data) + 1 > max_bytes):
+            yield chunk
+            chunk, nbytes = [], 2
+        chunk.append((doc, data))
+        nbytes += len(data) + 1
+    if chunk:
+        yield chunk
+
+
+def retryable(status, payload):
+    """Whether a failed POST can safely be sent again."""
+    if status is None:
+        return isinstance(payload, CONNECT_ERRORS)
+    return status in RETRY_STATUS
+
+
+def chunk_body(chunk):
+    if len(chunk) == 1:
+        return chunk[0][1]
+    return b"[" + b",".join(data for _, data in chunk) + b"]"
+
+
+def item_results(payload, n):
+    """Per document results of a POST response, None where unknown.
+    """
+    if not isinstance(payload, dict):
+        return [None] * n
+    if "_items" in payload:
+        results = list(payload["_items"])
+    elif n == 1:
+        results = [payload]
+    else:
+        results = []
+    return (results + [None] * n)[:n]
+
+
+class BulkInsert:
+    """Insert documents into a resource chunk by chunk.
+
+    Args:
+        resource (EveResource): target resource
+        chunk_size (int, optional): documents per request. Defaults to settings.BULK_CHUNK_SIZE.
+        max_bytes (int, optional): encoded bytes per request. Defaults to settings.BULK_MAX_BYTES.
+        concurrency (int, optional): requests in flight. Defaults to 4.
+        retries (int, optional): attempts after a connection failure, 429 or 503. Defaults to 2.
+        backoff (float, optional): seconds before the first retry, doubled on each one.
+                    Defaults to 0.5.
+        timeout (float, optional): request timeout.
+    """
+
+    def __init__(self, resource, chunk_size=None, max_bytes=None, concurrency=4, retries=2,
+                 backoff=0.5, timeout=None):
+        self.resource = resource
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.concurrency = max(concurrency, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def post_chunk(self, client, chunk):
+        """POST one chunk.
+
+        Returns:
+            tuple: status code (None on transport errors), response payload or
+                    the transport error
+        """
+        try:
+            resp = client.post(self.resource._url, content=chunk_body(chunk))
+        except httpx.HTTPStatusError as e:
+            resp = e.response
+        except ServerError as e:
+            return e.status_code, str(e)
+        except httpx.HTTPError as e:
+            return None, e
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = resp.text
+        return resp.status_code, payload
+
+    def send(self, client, chunk, attempt=0):
+        """Send a chunk, retrying connection failures, 429 and 503.
+
+        Returns:
+            tuple[list, list, list, list]: inserted documents, rejected documents,
+                    rejection reasons and chunks to send again
+        """
+        while True:
+            status, payload = self.post_chunk(client, chunk)
+            if retryable(status, payload) and attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+            break
+
+        docs = [doc for doc, _ in chunk]
+        if status is not None and status < 300:
+            inserted, rejected, errors = [], [], []
+            for item, result in zip(chunk, item_results(payload, len(chunk))):
+                if result is None or result.get("_status", "OK") == "OK":
+                    inserted.append(item[0])
+                else:
+                    rejected.append(item[0])
+                    errors.append(result)
+            return inserted, rejected, errors, []
+        if status == 413 and len(chunk) > 1:
+            half = len(chunk) // 2
+            return [], [], [], [chunk[:half], chunk[half:]]
+        results = item_results(payload, len(chunk))
+        if status is not None and 400 <= status < 500 and any(results):
+            # Eve inserts nothing from a chunk with an invalid document,
+            # the valid ones are sent again on their own
+            rejected, errors, valid = [], [], []
+            for item, result in zip(chunk, results):
+                if result is not None and result.get("_status") == "OK":
+                    valid.append(item)
+                else:
+                    rejected.append(item[0])
+                    errors.append(result or payload)
+            return [], rejected, errors, [valid] if valid else []
+        error = payload if isinstance(payload, dict) else {"_status": "ERR", "_error": {
+            "code": status, "message": str(payload)}}
+        return [], docs, [error] * len(docs), []
+
+    def run(self, docs):
+        """Insert documents.
+
+        Args:
+            docs (Iterable[dict]): documents, consumed lazily
+
+        Returns:
+            tuple[list, list, list]: inserted documents, rejected documents,
+                    rejection reasons aligned with the rejected documents
+        """
+        inserted, rejected, errors = [], [], []
+        chunks = chunk_documents(docs, chunk_size=self.chunk_size, max_bytes=self.max_bytes)
+        pending = []
+        headers = {"Content-Type": "application/json"}
+        kwargs = {} if self.timeout is None else {"timeout": self.timeout}
+        with self.resource.session.Client(headers=headers, **kwargs) as client, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            running = set()
+            exhausted = False
+            while True:
+                # keep at most concurrency chunks in flight, the input is read lazily
+                while len(running) < self.concurrency:
+                    if pending:
+                        chunk = pending.pop()
+                    elif not exhausted:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            continue
+                    else:
+                        break
+                    running.add(executor.submit(self.send, client, chunk))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ok, bad, errs, again = future.result()
+                    inserted.extend(ok)
+                    rejected.extend(bad)
+                    errors.extend(errs)
+                    pending.extend(again)
+        return inserted, rejected, errors
+
+
+def media_file(name, value):
+    """Multipart file tuple for a media value and whether it was opened here.
+    Paths and media handles are opened lazily and file objects are passed
+    through, httpx streams them in chunks instead of reading them into memory.
+    """
+    if isinstance(value, (str, os.PathLike)):
+        return (os.path.basename(os.fspath(value)), open(value, "rb")), True
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return (name, io.BytesIO(value)), False
+    if isinstance(value, MediaHandle):
+        return (name, value.open()), True
+    if hasattr(value, "read"):
+        filename = getattr(value, "name", None)
+        if not isinstance(filename, str):
+            filename = name
+        return (os.path.basename(filename), value), False
+    raise TypeError(f"Cannot upload {type(value).__name__} as media field {name}.")
+
+
+def rewind(value):
+    """Seek a file object back to the start for a retry, False if it cannot be."""
+    if isinstance(value, (str, os.PathLike, bytes, bytearray, memoryview, MediaHandle)):
+        return True
+    try:
+        value.seek(0)
+        return True
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+class MediaUpload(BulkInsert):
+    """Insert documents with media fields, one multipart request per document.
+    Each request carries only its own document, media content is streamed
+    from bytes, paths, file objects or media handles. Documents are
+    uploaded concurrently.
+
+    Args:
+        fields_as_json (bool, optional): JSON encode every form field, for servers
+                    with MULTIPART_FORM_FIELDS_AS_JSON enabled. Otherwise only
+                    non string values are JSON encoded. Defaults to False.
+    """
+
+    def __init__(self, resource, concurrency=4, retries=2, backoff=0.5, timeout=None,
+                 fields_as_json=False):
+        super().__init__(resource, concurrency=concurrency, retries=retries,
+                         backoff=backoff, timeout=timeout)
+        self.fields_as_json = fields_as_json
+
+    def form(self, doc):
+        media = set(self.resource._file_fields)
+        data = {}
+        for name, value in doc.items():
+            if name in media or value is None:
+                continue
+            if isinstance(value, str) and not self.fields_as_json:
+                data[name] = value
+            else:
+                data[name] = json.dumps(value, cls=NumpyJSONENncoder)
+        return data
+
+    def post_document(self, client, doc):
+        opened = []
+        try:
+            files = {}
+            for name in self.resource._file_fields:
+                if doc.get(name) is None:
+                    continue
+                files[name], is_open = media_file(name, doc[name])
+                if is_open:
+                    opened.append(files[name][1])
+            resp = client.post(self.resource._url, data=self.form(doc), files=files)
+        except httpx.HTTPStatusError as e:
+            resp = e.response
+        except ServerError as e:
+            return e.status_code, str(e)
+        except (httpx.HTTPError, OSError) as e:
+            return None, e
+        finally:
+            for f in opened:
+                f.close()
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = resp.text
+        return resp.status_code, payload
+
+    def send(self, client, doc, attempt=0):
+        while True:
+            status, payload = self.post_document(client, doc)
+            if retryable(status, payload) and attempt < self.retries \
+                    and all(rewind(doc[name]) for name in self.resource._file_fields
+                            if doc.get(name) is not None):
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                continue
+            break
+        if status is not None and status < 300 and (not isinstance(payload, dict)
+                                                    or payload.get("_status", "OK") == "OK"):
+            return [doc], [], [], []
+        error = payload if isinstance(payload, dict) else {"_status": "ERR", "_error": {
+            "code": status, "message": str(payload)}}
+        return [], [doc], [error], []
+
+    def run(self, docs):
+        """Upload documents.
+
+        Args:
+            docs (Iterable[dict]): documents, consumed lazily
+
+        Returns:
+            tuple[list, list, list]: inserted documents, rejected documents,
+                    rejection reasons aligned with the rejected documents
+        """
+        inserted, rejected, errors = [], [], []
+        docs = iter(docs)
+        kwargs = {} if self.timeout is None else {"timeout": self.timeout}
+        with self.resource.session.Client(**kwargs) as client, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            running = set()
+            for doc in docs:
+                running.add(executor.submit(self.send, client, doc))
+                if len(running) < self.concurrency:
+                    continue
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ok, bad, errs, _ = future.result()
+                    inserted.extend(ok)
+                    rejected.extend(bad)
+                    errors.extend(errs)
+            for future in running:
+                ok, bad, errs, _ = future.result()
+                inserted.extend(ok)
+                rejected.extend(bad)
+                errors.extend(errs)
+        return inserted, rejected, errors
+
+
+def upload_with_media(resource, docs, **kwargs):
+    """Insert documents with media fields into resource, see :class:`MediaUpload`.
+    """
+    return MediaUpload(resource, **kwargs).run(docs)
+
+
+def insert_chunked(resource, docs, **kwargs):
+    """Insert documents into resource, see :class:`BulkInsert`.
+    """
+    return BulkInsert(resource, **kwargs).run(docs)
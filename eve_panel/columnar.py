@@ -0,0 +1,230 @@
+"""
+Columnar
+========
+Schema driven construction of columnar data from Eve documents.
+"""
+
+import numpy as np
+
+EVE_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
+
+META_SCHEMA = {
+    "_id": {"type": "objectid"},
+    "_etag": {"type": "string"},
+    "_created": {"type": "datetime"},
+    "_updated": {"type": "datetime"},
+    "_version": {"type": "integer"},
+    "_latest_version": {"type": "integer"},
+    "_deleted": {"type": "boolean"},
+}
+
+
+def field_schema(schema, name):
+    return schema.get(name, META_SCHEMA.get(name, {}))
+
+
+def object_column(values, nullable=False):
+    import pandas as pd
+    return pd.Series(values, dtype=object).array
+
+
+def integer_column(values, nullable=False):
+    import pandas as pd
+    if not nullable and None not in values:
+        try:
+            return np.array(values, dtype="int64")
+        except (TypeError, ValueError, OverflowError):
+            pass
+    try:
+        return pd.array(values, dtype="Int64")
+    except (TypeError, ValueError):
+        return object_column(values)
+
+
+def float_column(values, nullable=False):
+    try:
+        return np.array(values, dtype="float64")
+    except (TypeError, ValueError):
+        return object_column(values)
+
+
+def boolean_column(values, nullable=False):
+    import pandas as pd
+    if not nullable and None not in values:
+        return np.array(values, dtype=bool)
+    return pd.array(values, dtype="boolean")
+
+
+def datetime_column(values, nullable=False):
+    import pandas as pd
+    try:
+        return pd.to_datetime(values, format=EVE_DATE_FORMAT).values
+    except (TypeError, ValueError):
+        return pd.to_datetime(values, errors="coerce").values
+
+
+def string_column(values, nullable=False):
+    import pandas as pd
+    try:
+        return pd.array(values, dtype="string")
+    except (TypeError, ValueError):
+        return object_column(values)
+
+
+COLUMN_BUILDERS = {
+    "objectid": string_column,
+    "boolean": boolean_column,
+    "date": datetime_column,
+    "datetime": datetime_column,
+    "float": float_column,
+    "integer": integer_column,
+    "number": float_column,
+}
+
+
+CATEGORICAL_TYPES = ("string", "integer", "float", "number")
+
+
+def categorical(schema):
+    """Whether a field with allowed values is stored as a pandas Categorical,
+    only scalar fields are, lists with allowed items keep their own dtype.
+    """
+    return "allowed" in schema and schema.get("type", "string") in CATEGORICAL_TYPES
+
+
+def to_column(schema, values, nullable=False):
+    """Convert a list of field values to an array with a dtype
+    matching the field schema.
+
+    Args:
+        schema (dict): Eve schema of the field
+        values (list): field values, missing values as None
+        nullable (bool, optional): always use nullable dtypes for integers and booleans,
+                        so the dtype does not depend on the values. Defaults to False.
+
+    Returns:
+        array: numpy or pandas extension array
+    """
+    if categorical(schema):
+        import pandas as pd
+        categories = list(dict.fromkeys(schema["allowed"]))
+        known = set(categories)
+        # values outside allowed would become NaN, keep them with the plain dtype
+        if all(v is None or (isinstance(v, (str, int, float)) and v in known) for v in values):
+            return pd.Categorical(values, categories=categories)
+    builder = COLUMN_BUILDERS.get(schema.get("type", "string"), object_column)
+    return builder(values, nullable=nullable)
+
+
+def conform_column(schema, series, nullable=False):
+    """Convert a column built elsewhere, e.g. by arrow's to_pandas, to the
+    dtype :func:`to_column` gives the same values.
+
+    Args:
+        schema (dict): Eve schema of the field
+        series (pandas.Series): column
+        nullable (bool, optional): as in :func:`to_column`. Defaults to False.
+
+    Returns:
+        pandas.Series: converted column
+    """
+    import pandas as pd
+    kind = schema.get("type", "string")
+    has_nulls = bool(series.isna().any())
+    if categorical(schema):
+        categories = list(dict.fromkeys(schema["allowed"]))
+        if set(series.dropna().unique()) <= set(categories):
+            return series.astype(pd.CategoricalDtype(categories))
+        series = series.astype(object)
+    elif kind == "integer":
+        return series.astype("Int64" if nullable or has_nulls else "int64")
+    elif kind == "boolean":
+        return series.astype("boolean" if nullable or has_nulls else "bool")
+    elif kind in ("float", "number"):
+        return series.astype("float64")
+    elif kind in ("date", "datetime"):
+        if getattr(series.dtype, "tz", None) is not None:
+            series = series.dt.tz_localize(None)
+        return series.astype("datetime64[ns]")
+    elif kind == "objectid":
+        return series.astype("string")
+    elif kind in ("dict", "list", "set"):
+        return pd.Series([plain_value(v, schema) for v in series], index=series.index,
+                         dtype=object, name=series.name)
+    return series.astype(object).where(series.notna(), None)
+
+
+def plain_value(value, schema):
+    """Python value of a nested arrow value: free form values stored as
+    json strings are parsed, arrays become lists and maps dicts.
+    """
+    import json
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    kind = schema.get("type", "string")
+    if isinstance(value, str) and kind in ("dict", "list", "set") \
+            and not isinstance(schema.get("schema"), dict) \
+            and not isinstance(schema.get("valuesrules"), dict):
+        return json.loads(value)
+    if kind == "dict" and isinstance(schema.get("valuesrules"), dict):
+        return {k: plain_value(v, schema["valuesrules"]) for k, v in value}
+    if kind == "dict" and isinstance(schema.get("schema"), dict):
+        return {k: plain_value(v, schema["schema"].get(k, {})) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return [plain_value(v, schema.get("schema") or {}) for v in value]
+    return value
+
+
+class ColumnBuilder:
+    """Collects documents into per field buffers, page by page,
+    and builds typed columns from them.
+
+    Args:
+        schema (dict): Eve schema of the resource
+        fields (list): fields to collect
+        index (str, optional): field to use as index. Defaults to "_id".
+        nullable (bool, optional): use nullable integer and boolean dtypes. Defaults to False.
+    """
+
+    def __init__(self, schema, fields, index="_id", nullable=False):
+        self.schema = schema
+        self.index = index
+        self.nullable = nullable
+        self.fields = list(dict.fromkeys([index] + list(fields) if index else fields))
+        self.buffers = {name: [] for name in self.fields}
+
+    def __len__(self):
+        return len(self.buffers[self.fields[0]]) if self.fields else 0
+
+    def append(self, docs):
+        """Append documents (dicts) to the buffers.
+        """
+        docs = list(docs)
+        for name, buffer in self.buffers.items():
+            buffer.extend([doc.get(name) for doc in docs])
+
+    def append_items(self, items):
+        """Append items (objects with field attributes) to the buffers.
+        """
+        items = list(items)
+        for name, buffer in self.buffers.items():
+            buffer.extend([getattr(item, name, None) for item in items])
+
+    def columns(self):
+        """Typed columns built from the buffers, the buffers are emptied.
+        """
+        columns = {}
+        for name in self.fields:
+            values = self.buffers[name]
+            self.buffers[name] = []
+            columns[name] = to_column(field_schema(self.schema, name), values,
+                                      nullable=self.nullable)
+        return columns
+
+    def to_dataframe(self):
+        import pandas as pd
+        columns = self.columns()
+        index = None
+        if self.index in columns:
+            index = pd.Index(columns.pop(self.index), name=self.index)
+        return pd.DataFrame(columns, index=index, columns=[f for f in self.fields if f != self.index])
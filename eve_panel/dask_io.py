@@ -0,0 +1,192 @@
+"""
+Dask IO
+=======
+Reading resources into dask collections, one partition per _id range.
+"""
+
+import hashlib
+import json
+import threading
+import warnings
+
+from .columnar import ColumnBuilder
+from .shard import sample_boundaries, shard_queries
+from .utils import has_next_page
+
+_CLIENTS = {}
+_APPS = {}
+_LOCK = threading.Lock()
+
+
+def client_spec(session):
+    """Picklable description of the http client of a session.
+    A self-serve Eve app is replaced by its settings and rebuilt on the workers.
+    """
+    kwargs = session.get_client_kwargs()
+    app = kwargs.pop("app", None)
+    spec = {
+        "kwargs": kwargs,
+        "app_settings": dict(app.config) if app is not None else None,
+    }
+    spec["key"] = hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+    return spec
+
+
+def get_client(spec):
+    """Client for spec, created once per worker process and reused by its partitions.
+    """
+    import httpx
+
+    key = spec["key"]
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None or client.is_closed:
+            kwargs = dict(spec["kwargs"])
+            if spec["app_settings"] is not None:
+                if key not in _APPS:
+                    from eve import Eve
+                    _APPS[key] = Eve(settings=spec["app_settings"])
+                kwargs["app"] = _APPS[key]
+            client = _CLIENTS[key] = httpx.Client(**kwargs)
+    return client
+
+
+def fetch_documents(spec, url, query, projection, sort, max_results):
+    """All documents matching query, page by page. Errors are raised, not
+    swallowed, so a failed partition fails the computation. Paging follows
+    the next link or the total and page size reported by the server.
+    """
+    client = get_client(spec)
+    params = {
+        "where": json.dumps(query),
+        "projection": json.dumps(projection),
+        "sort": sort,
+        "max_results": max_results,
+    }
+    docs = []
+    page = 1
+    while True:
+        resp = client.get(url, params=dict(params, page=page))
+        resp.raise_for_status()
+        data = resp.json()
+        if "_error" in data:
+            raise ValueError(f"Reading {url} failed: {data['_error']}")
+        docs.extend(data.get("_items", []))
+        if not has_next_page(data, page):
+            return docs
+        params["max_results"] = int((data.get("_meta") or {}).get("max_results") or max_results)
+        page += 1
+
+
+def fetch_page(spec, url, params):
+    client = get_client(spec)
+    resp = client.get(url, params=params)
+    resp.raise_for_status()
+    data = resp.json()
+    if "_error" in data:
+        raise ValueError(f"Reading {url} failed: {data['_error']}")
+    return data.get("_items", [])
+
+
+def read_partition(spec, url, query, projection, max_results, schema, fields):
+    docs = fetch_documents(spec, url, query, projection, "_id", max_results)
+    builder = ColumnBuilder(schema, fields, nullable=True)
+    builder.append(docs)
+    return builder.to_dataframe()
+
+
+def read_page(spec, url, params, schema, fields):
+    builder = ColumnBuilder(schema, fields, nullable=True)
+    builder.append(fetch_page(spec, url, params))
+    return builder.to_dataframe()
+
+
+def id_range(resource):
+    """Smallest and largest _id matching the resource filters.
+    """
+    ends = []
+    for sort in ("_id", "-_id"):
+        resp = resource.get(where=resource.filters, projection={"_id": 1}, sort=sort,
+                            max_results=1, page=1, cache_result=False)
+        items = resp.get("_items", [])
+        if not items:
+            return None
+        ends.append(items[0]["_id"])
+    return tuple(ends)
+
+
+def to_dask(resource, npartitions=8, persist=False, progress=True, pages=None):
+    """Read a resource into a dask DataFrame indexed by _id, or a bag for
+    non tabular resources.
+
+    Partitions are _id ranges sampled from the server, so the divisions
+    are known and each partition can be fetched independently. Workers
+    reuse one client (and self-serve Eve app) per process.
+
+    Args:
+        resource (EveResource): resource to read
+        npartitions (int, optional): number of _id ranges. Defaults to 8.
+        persist (bool, optional): persist the result. Defaults to False.
+        progress (bool, optional): register a dask progress bar. Defaults to True.
+        pages (list, optional): deprecated, read one partition per page number
+                    instead of _id ranges, the divisions are unknown.
+
+    Returns:
+        Union[dask.dataframe.DataFrame, dask.bag.Bag]: lazy collection
+    """
+    if not isinstance(npartitions, int):
+        # to_dask(pages) of earlier versions
+        npartitions, pages = 8, npartitions
+    if pages is not None:
+        warnings.warn("The pages argument of to_dask is deprecated, use npartitions.",
+                      DeprecationWarning, stacklevel=2)
+    try:
+        import dask
+    except ImportError:
+        raise RuntimeError("Dask is not installed.")
+    if progress:
+        from dask.diagnostics import ProgressBar
+        ProgressBar().register()
+
+    spec = client_spec(resource.session)
+    url = resource._url
+    query = dict(resource.filters)
+    projection = resource.projection
+    max_results = resource.items_per_page
+    fields = [f for f in resource.fields if f in resource.schema]
+
+    if pages is not None:
+        params = [resource.get_page_kwargs(i) for i in pages]
+        if not resource.is_tabular:
+            import dask.bag as db
+            fetch = dask.delayed(fetch_page, pure=True)
+            return db.from_delayed([fetch(spec, url, p) for p in params])
+        import dask.dataframe as dd
+        meta = ColumnBuilder(resource.schema, fields, nullable=True).to_dataframe()
+        read = dask.delayed(read_page, pure=True)
+        df = dd.from_delayed([read(spec, url, p, resource.schema, fields) for p in params],
+                             meta=meta)
+        return df.persist() if persist else df
+
+    boundaries = sample_boundaries(resource, "_id", npartitions, query)
+    queries = shard_queries(query, "_id", boundaries)
+
+    if not resource.is_tabular:
+        import dask.bag as db
+        fetch = dask.delayed(fetch_documents, pure=True)
+        parts = [fetch(spec, url, q, projection, "_id", max_results) for q in queries]
+        return db.from_delayed(parts)
+
+    import dask.dataframe as dd
+    meta = ColumnBuilder(resource.schema, fields, nullable=True).to_dataframe()
+    read = dask.delayed(read_partition, pure=True)
+    parts = [read(spec, url, q, projection, max_results, resource.schema, fields)
+             for q in queries]
+    ends = id_range(resource)
+    divisions = None
+    if ends is not None:
+        divisions = [ends[0]] + list(boundaries) + [ends[1]]
+    df = dd.from_delayed(parts, meta=meta, divisions=divisions)
+    if persist:
+        return df.persist()
+    return df
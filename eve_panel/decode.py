@@ -0,0 +1,140 @@
+"""
+Decode
+======
+Process pool stage decoding raw response bytes into Arrow record batches.
+Fetch threads only move bytes, JSON and base64 decoding and the columnar
+conversion run in worker processes, results come back as Arrow IPC
+streams through shared memory.
+"""
+
+import collections
+import ctypes
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+
+def _untrack(shm):
+    # the parent process unlinks the segment, keep the worker's
+    # resource tracker from unlinking it again when the worker exits
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def decode_page(raw, schema, fields):
+    """Decode one raw Eve response into an Arrow IPC stream in shared memory.
+    Runs in a worker process.
+
+    Args:
+        raw (bytes): response body
+        schema (dict): Eve schema of the resource
+        fields (list): fields to include
+
+    Returns:
+        tuple: name and size of the shared memory segment
+    """
+    from .arrow_io import import_pyarrow, to_record_batch
+
+    pa = import_pyarrow()
+    docs = json.loads(raw).get("_items", [])
+    batch = to_record_batch(docs, schema, fields)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    buf = sink.getvalue()
+    shm = shared_memory.SharedMemory(create=True, size=max(buf.size, 1))
+    _untrack(shm)
+    try:
+        shm.buf[:buf.size] = memoryview(buf).cast("B")
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, buf.size
+
+
+def release(name, size):
+    shm = shared_memory.SharedMemory(name=name)
+    shm.close()
+    shm.unlink()
+
+
+def read_shared_batch(name, size):
+    """Read a record batch written by :func:`decode_page` without copying it.
+    The segment is unlinked right away, its mapping lives as long as the
+    batch references it.
+    """
+    from .arrow_io import import_pyarrow
+
+    pa = import_pyarrow()
+    shm = shared_memory.SharedMemory(name=name)
+    shm.unlink()
+    view = ctypes.c_char.from_buffer(shm._mmap)
+    address = ctypes.addressof(view)
+    # drop the export so the mapping can be closed once arrow releases shm
+    del view
+    data = pa.foreign_buffer(address, size, base=shm)
+    return pa.ipc.open_stream(data).read_next_batch()
+
+
+def check_process_options(shards=None, executor=None):
+    """The process pool stage fetches pages itself, options of the
+    threaded fetcher cannot be combined with it.
+    """
+    if shards:
+        raise ValueError("shards cannot be combined with processes.")
+    if executor is not None:
+        raise ValueError("executor cannot be combined with processes.")
+
+
+def iter_decoded_batches(resource, processes=None, threads=8, prefetch=16, start=1, end=None,
+                         pbar=None):
+    """Fetch pages as raw bytes in threads and decode them in a process pool.
+
+    Args:
+        resource (EveResource): resource to read
+        processes (int, optional): worker processes. Defaults to the number of cores.
+        threads (int, optional): concurrent page requests. Defaults to 8.
+        prefetch (int, optional): pages in flight. Defaults to 16.
+
+    Yields:
+        pyarrow.RecordBatch: one batch per page, in page order
+    """
+    fields = resource.table_fields
+    schema = resource.schema
+    pages = [idx for idx in resource.page_numbers
+             if idx >= start and (end is None or idx <= end)]
+
+    def fetch(idx):
+        return resource.get_raw(**resource.get_page_kwargs(idx))
+
+    with ThreadPoolExecutor(max_workers=threads) as fetcher, \
+            ProcessPoolExecutor(max_workers=processes) as decoder:
+        idxs = iter(pages)
+        fetching = collections.deque(fetcher.submit(fetch, idx)
+                                     for idx in itertools.islice(idxs, max(prefetch, 1)))
+        decoding = collections.deque()
+        try:
+            while fetching or decoding:
+                # hand fetched pages to the decoders while later pages are downloaded
+                while fetching and len(decoding) < max(prefetch // 2, 1):
+                    raw = fetching.popleft().result()
+                    decoding.append(decoder.submit(decode_page, raw, schema, fields))
+                    fetching.extend(fetcher.submit(fetch, idx)
+                                    for idx in itertools.islice(idxs, 1))
+                name, size = decoding.popleft().result()
+                batch = read_shared_batch(name, size)
+                if pbar is not None:
+                    pbar.update(batch.num_rows)
+                yield batch
+        finally:
+            for future in fetching:
+                future.cancel()
+            for future in decoding:
+                if not future.cancel() and future.exception() is None:
+                    release(*future.result())
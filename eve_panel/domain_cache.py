@@ -0,0 +1,137 @@
+"""
+Domain cache
+============
+On disk cache of domain definitions served by Eve servers,
+validated against the server with ETags on every client start.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import httpx
+
+from .settings import config as settings
+from .utils import schema_hash
+
+logger = logging.getLogger(__name__)
+
+
+class DomainCache:
+    """Cache of domain definitions, one json file per domain url.
+
+    Each entry holds the domain definition with the ETag and content hash it
+    was served with, so an unchanged domain is loaded from disk instead of
+    being downloaded again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or settings.CACHE_DIR
+
+    def entry_path(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.path, f"domain_{key}.json")
+
+    def load(self, url):
+        path = self.entry_path(url)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable domain cache {path}: {e}")
+            return None
+        if entry.get("url") != url:
+            return None
+        return entry
+
+    def save(self, url, domain, etag=None):
+        entry = {
+            "url": url,
+            "etag": etag,
+            "hash": schema_hash(domain),
+            "domain": domain,
+        }
+        path = self.entry_path(url)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write domain cache {path}: {e}")
+        return entry
+
+    def clear(self, url=None):
+        if url is not None:
+            paths = [self.entry_path(url)]
+        elif os.path.isdir(self.path):
+            paths = [os.path.join(self.path, name) for name in os.listdir(self.path)
+                     if name.startswith("domain_")]
+        else:
+            paths = []
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def fetch(self, url, client):
+        """Get the domain definition at url, revalidating the cached copy.
+
+        Args:
+            url (str): url serving the domain definition
+            client (httpx.Client): client used for the request
+
+        Returns:
+            dict: domain definition
+        """
+        entry = self.load(url)
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        try:
+            resp = client.get(url, headers=headers)
+        except httpx.TransportError as e:
+            if entry is None:
+                raise
+            logger.warning(f"Cannot reach {url}, using cached domain definition: {e}")
+            return entry["domain"]
+        if resp.status_code == 304 and entry is not None:
+            return entry["domain"]
+        resp.raise_for_status()
+        domain = resp.json()
+        etag = resp.headers.get("ETag")
+        if entry is not None and entry["hash"] == schema_hash(domain):
+            if etag != entry.get("etag"):
+                self.save(url, entry["domain"], etag)
+            return entry["domain"]
+        self.save(url, domain, etag)
+        return domain
+
+
+def fetch_domain(url, session=None, cache=True):
+    """Download the domain definition served at url.
+
+    Args:
+        url (str): url serving the domain definition
+        session (EveSession, optional): session whose auth and client settings are used.
+        cache (Union[bool, DomainCache], optional): revalidate against the on disk cache.
+                            Defaults to True.
+
+    Returns:
+        dict: domain definition
+    """
+    if session is not None and session.logged_in:
+        kwargs = session.get_client_kwargs()
+    else:
+        kwargs = {}
+    with httpx.Client(**kwargs) as client:
+        if not cache:
+            resp = client.get(url)
+            resp.raise_for_status()
+            return resp.json()
+        if not isinstance(cache, DomainCache):
+            cache = DomainCache()
+        return cache.fetch(url, client)
@@ -4,18 +4,79 @@ Eve client
 Client for single or multiple Eve APIs.
 """
 
+import threading
 from pprint import pprint
 
-import panel as pn
 import param
 from collections import defaultdict
-import httpx
 
+from .domain_cache import fetch_domain
 from .eve_model import EveModelBase
 from .session import DEFAULT_SESSION_CLASS, EveSessionBase
 from .settings import config as settings
 from .resource import EveResource
 
+# serializes building lazy resources, so concurrent first accesses build one
+_BUILD_LOCK = threading.RLock()
+
+
+class LazyResource(param.ClassSelector):
+    """Parameter holding an EveResource that is only built from
+    its resource definition when first accessed.
+    """
+
+    __slots__ = ["resource_def", "resource_name"]
+
+    def __init__(self, resource_def, resource_name, **params):
+        self.resource_def = resource_def
+        self.resource_name = resource_name
+        super().__init__(EveResource, default=None, allow_None=True,
+                         instantiate=False, constant=True, **params)
+
+    def __get__(self, obj, objtype):
+        if obj is None:
+            return super().__get__(obj, objtype)
+        resource = obj.__dict__.get(self._internal_name, None)
+        if resource is not None:
+            return resource
+        with _BUILD_LOCK:
+            resource = obj.__dict__.get(self._internal_name, None)
+            if resource is None:
+                resource = EveResource.from_resource_def(self.resource_def,
+                                                         self.resource_name,
+                                                         session=obj.session)
+                obj.__dict__[self._internal_name] = resource
+        return resource
+
+    def is_built(self, obj):
+        return obj.__dict__.get(self._internal_name, None) is not None
+
+
+class ResourceHandle:
+    """Reference to a resource of a client that has not been built yet.
+    Attribute access is forwarded to the resource, building it on first use.
+    """
+
+    def __init__(self, client, attr, name):
+        self.client = client
+        self.attr = attr
+        self.name = name
+
+    @property
+    def resource(self):
+        return getattr(self.client, self.attr)
+
+    def panel(self):
+        return self.resource.panel()
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in ("client", "attr", "name"):
+            raise AttributeError(name)
+        return getattr(self.resource, name)
+
+    def __repr__(self):
+        return f"ResourceHandle(name={self.name})"
+
 
 class EveClient(EveModelBase):
     name = param.String("EveClient", doc="Human readable name of the client")
@@ -45,20 +106,11 @@ class EveClient(EveModelBase):
             if rest:
                 sub_domains[sub_url][rest] = resource_def
             else:
-                resource = EveResource.from_resource_def(
-                    resource_def, url, session=session)
-                params[sub_url] = param.ClassSelector(resource.__class__,
-                                                      default=resource,
-                                                      constant=True)
-                kwargs[sub_url] = resource
+                params[sub_url] = LazyResource(resource_def, url)
         for url, domain_def in sub_domains.items():
             if url in params:
                 for sub_url, resource_def in domain_def.items():
-                    resource = EveResource.from_resource_def(
-                        resource_def, url, session=session)
-                    kwargs[url + "_" + sub_url] = resource
-                    params[url + "_" + sub_url] = param.ClassSelector(
-                        resource.__class__, default=resource, constant=True)
+                    params[url + "_" + sub_url] = LazyResource(resource_def, url)
             else:
                 sub_domain = EveClient.from_domain_def(domain_def,
                                                        url,
@@ -73,11 +125,23 @@ class EveClient(EveModelBase):
         return instance
 
     @classmethod
-    def from_server(cls, url, **kwargs):
-        r = httpx.get(url)
-        r.raise_for_status()
-        domain = r.json()
-        return cls.from_domain_def(domain_def=domain, **kwargs)
+    def from_server(cls, url, session=None, auth_scheme=None, servers={}, cache=True, **kwargs):
+        """Build a client from the domain definition served at url.
+
+        Args:
+            url (str): url serving the domain definition
+            session (EveSession, optional): session to use. Defaults to None.
+            cache (Union[bool, DomainCache], optional): keep the domain definition in an
+                            on disk cache and only download it again when the server's
+                            copy changed. Defaults to True.
+
+        Returns:
+            EveClient: client for the served domain.
+        """
+        if session is None:
+            session = DEFAULT_SESSION_CLASS(known_servers=servers, auth_scheme=auth_scheme)
+        domain = fetch_domain(url, session=session, cache=cache)
+        return cls.from_domain_def(domain_def=domain, session=session, **kwargs)
 
     @classmethod
     def from_app(cls, app, **kwargs):
@@ -97,21 +161,25 @@ class EveClient(EveModelBase):
 
     @property
     def resources(self):
-        return {k:v for k, v in self.param.get_param_values() if isinstance(v, EveResource)}
+        """Resources of the client, those not built yet as ResourceHandles.
+        """
+        return {k: self._resource_or_handle(k, v) for k, v in self.param.objects().items()
+                if isinstance(v, LazyResource)}
     
     @property
     def sub_resources(self):
-        return {k:v for k, v in self.param.get_param_values() if isinstance(v, EveClient)}
+        return {k: getattr(self, k) for k, v in self.param.objects().items()
+                if isinstance(v, param.ClassSelector) and v.class_ is EveClient}
 
     @property
     def resource_tree(self):
         return self.collect_resource_tree(False)
 
     def make_panel(self, show_client=True, tabs_location='above'):
+        import panel as pn
         tabs = [
             (k.upper().replace("_", " "),
-             getattr(self, k).make_panel(show_client=False,
-                                         tabs_location="above"))
+             pn.param.ParamFunction(self._tab_view(k), lazy=True))
             for k, v in self.param.objects().items()
             if isinstance(v, param.ClassSelector) and v.class_ in (EveClient,
                                                                    EveResource)
@@ -129,6 +197,12 @@ class EveClient(EveModelBase):
                     tabs_location=tabs_location)
         return view
 
+    def _tab_view(self, name):
+        def view():
+            return getattr(self, name).make_panel(show_client=False,
+                                                  tabs_location="above")
+        return view
+
     def set_token(self, token):
         self.session.set_credentials(token=token)
     
@@ -151,13 +225,19 @@ class EveClient(EveModelBase):
     def servers(self):
         return self.session.known_servers
 
+    def _resource_or_handle(self, attr, parameter):
+        if parameter.is_built(self):
+            return getattr(self, attr)
+        name = parameter.resource_def["resource_title"].replace(" ", "_")
+        return ResourceHandle(self, attr, name)
+
     def collect_resource_tree(self, sort=True):
         tree = {}
-        for k, v in self.param.get_param_values():
-            if isinstance(v, EveClient):
-                tree[k] = v.collect_resource_tree()
-            elif isinstance(v, EveResource):
-                tree[k] = v
+        for k, v in self.param.objects().items():
+            if isinstance(v, LazyResource):
+                tree[k] = self._resource_or_handle(k, v)
+            elif isinstance(v, param.ClassSelector) and v.class_ is EveClient:
+                tree[k] = getattr(self, k).collect_resource_tree()
         if sort:
             tree = dict(sorted(tree.items(), key=lambda x: len(x[0])))
         return tree
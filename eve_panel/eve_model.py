@@ -2,30 +2,31 @@
 Eve model
 ==========
 Base classes for objects that represent Eve models.
+Panel is only imported when a view is requested.
 """
 
-import panel as pn
 import param
 from copy import copy
 
 from .settings import config as settings
 
 
-class DefaultLayout(pn.GridBox):
-    ncols = param.Integer(max(1, int(settings.GUI_WIDTH / 200)))
-    width = param.Integer(settings.GUI_WIDTH)
+def __getattr__(name):
+    if name == "DefaultLayout":
+        from .widgets import DefaultLayout
+        return DefaultLayout
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class EveModelBase(param.Parameterized):
-    _panel = param.ClassSelector(pn.viewable.Viewable,
-                                 default=None,
-                                 precedence=-1)
+    _panel = param.Parameter(default=None, precedence=-1)
     max_width = param.Integer(default=settings.GUI_WIDTH, precedence=-1)
     max_height = param.Integer(default=settings.GUI_HEIGHT, precedence=-1)
     sizing_mode = param.Selector(default=settings.SIZING_MODE, precedence=-1, objects=["stretch_width", 
                                 "stretch_height", "stretch_both", "scale_width", "scale_height", "scale_both"])
 
     def make_panel(self):
+        import panel as pn
         parameters = [
             k for k, v in self.param.get_param_values()
              if not k.startswith("_") and not isinstance(v,bytes)]
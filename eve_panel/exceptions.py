@@ -9,3 +9,6 @@ class ServerError(EvePanelError):
     def __init__(self, status_code, message=""):
         self.status_code = status_code
         super().__init__(message)
+
+class UnsupportedQuery(EvePanelError):
+    pass
@@ -0,0 +1,192 @@
+"""
+Export
+======
+Resumable bulk export of resources to part files with a checkpoint.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+from .utils import NumpyJSONENncoder
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+EXPORT_SUFFIXES = {
+    "parquet": ".parquet",
+    "jsonl": ".jsonl",
+}
+
+
+def query_fingerprint(resource, format, directory=None):
+    """Hash of everything that determines the content and order of
+    the exported pages and where they are written.
+    """
+    state = {
+        "target": os.path.abspath(directory) if directory is not None else None,
+        "server": resource.session.server_url,
+        "url": resource._url,
+        "filters": resource.filters,
+        "fields": resource.fields,
+        "sorting": resource.sorting,
+        "items_per_page": resource.items_per_page,
+        "format": format,
+    }
+    data = json.dumps(state, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class Checkpoint:
+    """Progress of an export, stored next to the part files.
+
+    Args:
+        directory (str): export directory
+        fingerprint (str): query fingerprint of the export
+    """
+
+    def __init__(self, directory, fingerprint):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.last_page = 0
+        self.files = []
+        self.nrows = 0
+        self.complete = False
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, CHECKPOINT_FILE)
+
+    def to_dict(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "last_page": self.last_page,
+            "files": self.files,
+            "nrows": self.nrows,
+            "complete": self.complete,
+        }
+
+    @classmethod
+    def load(cls, directory, fingerprint):
+        """Load the checkpoint in directory if it belongs to the same query,
+        otherwise return a fresh one.
+        """
+        checkpoint = cls(directory, fingerprint)
+        if not os.path.isfile(checkpoint.path):
+            return checkpoint
+        with open(checkpoint.path, "r") as f:
+            data = json.load(f)
+        if data.get("fingerprint") != fingerprint:
+            logger.warning(f"Export in {directory} was made with a different query, starting over.")
+            return checkpoint
+        checkpoint.last_page = data.get("last_page", 0)
+        checkpoint.files = data.get("files", [])
+        checkpoint.nrows = data.get("nrows", 0)
+        checkpoint.complete = data.get("complete", False)
+        return checkpoint
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.path)
+
+    def discard_partial(self, suffix):
+        """Remove part files that are not recorded in the checkpoint, i.e. chunks
+        that were being written when the previous run stopped.
+        """
+        for name in os.listdir(self.directory):
+            if not name.startswith("part-") or name in self.files:
+                continue
+            if name.endswith(suffix) or name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+
+
+def write_part(path, pages, format, resource):
+    tmp = f"{path}.tmp"
+    if format == "parquet":
+        import pyarrow.parquet as pq
+        from .arrow_io import import_pyarrow, to_record_batch
+
+        pa = import_pyarrow()
+        fields = resource.table_fields
+        batches = [to_record_batch(page, resource.schema, fields) for page in pages]
+        pq.write_table(pa.Table.from_batches(batches, schema=resource.arrow_schema()), tmp)
+    else:
+        with open(tmp, "w") as f:
+            for page in pages:
+                for doc in page:
+                    f.write(json.dumps(doc, cls=NumpyJSONENncoder))
+                    f.write("\n")
+    os.replace(tmp, path)
+
+
+def export_resource(resource, directory, format="parquet", pages_per_file=10, resume=True,
+                    asynchronous=True, executor=None, pbar=None):
+    """Export the documents matching the resource filters to part files in directory.
+    A checkpoint is saved after each part so an interrupted export continues
+    from the first unwritten page when run again with the same query and
+    target. The export is only marked complete once the number of rows written
+    equals the total reported by the server. Running a completed export again
+    returns its files without fetching anything, with a warning. Use
+    resume=False to export again.
+
+    Args:
+        resource (EveResource): resource to export
+        directory (str): output directory
+        format (str, optional): "parquet" or "jsonl". Defaults to "parquet".
+        pages_per_file (int, optional): pages written to each part file. Defaults to 10.
+        resume (bool, optional): continue from the checkpoint, otherwise the part files
+                    of a previous export are removed. Defaults to True.
+
+    Returns:
+        list: paths of all part files of the export
+    """
+    if format not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unsupported export format {format}, use one of {list(EXPORT_SUFFIXES)}")
+    suffix = EXPORT_SUFFIXES[format]
+    os.makedirs(directory, exist_ok=True)
+    fingerprint = query_fingerprint(resource, format, directory)
+    if resume:
+        checkpoint = Checkpoint.load(directory, fingerprint)
+    else:
+        checkpoint = Checkpoint(directory, fingerprint)
+    checkpoint.discard_partial(suffix)
+
+    if checkpoint.complete:
+        logger.warning(f"Export in {directory} is already complete ({checkpoint.nrows} rows in "
+                       f"{len(checkpoint.files)} files), nothing was fetched. "
+                       "Use resume=False to export again.")
+    else:
+        total, _ = resource.page_layout()
+        start = checkpoint.last_page + 1
+        chunk = []
+
+        def flush():
+            first = checkpoint.last_page + 1
+            name = f"part-{first:06d}-{first + len(chunk) - 1:06d}{suffix}"
+            write_part(os.path.join(directory, name), chunk, format, resource)
+            checkpoint.files.append(name)
+            checkpoint.last_page += len(chunk)
+            checkpoint.nrows += sum(len(page) for page in chunk)
+            checkpoint.save()
+            chunk.clear()
+
+        for page in resource.pages_raw(start=start, asynchronous=asynchronous, executor=executor,
+                                       pbar=pbar, cache_result=False):
+            chunk.append(page)
+            if len(chunk) >= pages_per_file:
+                flush()
+        if chunk:
+            flush()
+        if checkpoint.nrows == total:
+            checkpoint.complete = True
+            checkpoint.save()
+        else:
+            logger.warning(f"Export in {directory} wrote {checkpoint.nrows} of {total} rows, "
+                           "it is not marked complete. The documents may have changed "
+                           "during the export, use resume=False to export again.")
+
+    return [os.path.join(directory, name) for name in checkpoint.files]
@@ -1,7 +1,10 @@
+import threading
+from contextlib import contextmanager
+
 import param
-from eve.io.mongo.validation import Validator
 
 from .types import COERCERS
+from .utils import schema_hash
 
 
 SUPPORTED_SCHEMA_FIELDS = [
@@ -27,11 +30,94 @@ TYPE_MAPPING = {
     "media": "binary",
 }
 
+_state = threading.local()
+
+_FIELD_CLASSES = {}
+_DOCUMENT_SCHEMAS = {}
+
+
+def trusted():
+    """Whether values are currently being set from a trusted source.
+    """
+    return getattr(_state, "trusted", False)
+
+
+@contextmanager
+def trusted_source():
+    """Skip field validation for values set inside this context.
+    Used when loading data that was already validated by the server.
+    """
+    previous = trusted()
+    _state.trusted = True
+    try:
+        yield
+    finally:
+        _state.trusted = previous
+
+
+def Validator(schema):
+    """Compile an Eve validator for a schema.
+    Eve is imported on first use so it is not loaded unless validation is needed.
+    """
+    from eve.io.mongo.validation import Validator
+    return Validator(schema)
+
+
+def document_validator(schema, coerce=True):
+    """Validator for whole documents of a resource schema.
+    Validators keep the state of the last validation, so each thread gets
+    its own, cached by schema hash.
+
+    Args:
+        schema (dict): Eve schema of the resource
+        coerce (bool, optional): coerce values to the schema types. Defaults to True.
+
+    Returns:
+        Validator: validator for documents of the given schema.
+    """
+    key = (schema_hash(schema), coerce)
+    validators = getattr(_state, "validators", None)
+    if validators is None:
+        validators = _state.validators = {}
+    if key in validators:
+        return validators[key]
+    if key not in _DOCUMENT_SCHEMAS:
+        _DOCUMENT_SCHEMAS[key] = document_schema(schema, coerce=coerce)
+    validators[key] = Validator(_DOCUMENT_SCHEMAS[key])
+    return validators[key]
+
+
+def document_schema(schema, coerce=True):
+    """Resource schema restricted to the rules the validator supports.
+    """
+    schema = {
+        name:
+        {k: v
+         for k, v in field.items() if k in SUPPORTED_SCHEMA_FIELDS}
+        for name, field in schema.items()
+    }
+    for name, sch in schema.items():
+        if sch["type"] in TYPE_MAPPING:
+            sch["type"] = TYPE_MAPPING[sch["type"]]
+    if coerce:
+        for sch in schema.values():
+            if sch["type"] in COERCERS:
+                sch["coerce"] = COERCERS[sch["type"]]
+    return schema
+
+
 def EveField(name, schema, klass):
     if isinstance(klass, param.ClassSelector):
         return klass
     if not isinstance(klass, type):
         return klass
+    key = (name, schema_hash(schema), klass)
+    if key not in _FIELD_CLASSES:
+        _FIELD_CLASSES[key] = _make_field_class(name, schema, klass)
+    return _FIELD_CLASSES[key]
+
+
+def _make_field_class(name, schema, klass):
     schema = {k: v for k, v in schema.items() if k in SUPPORTED_SCHEMA_FIELDS}
     if schema.get('type', 'string') in COERCERS:
         schema["coerce"] = COERCERS[schema.get('type', 'string')]
@@ -41,8 +127,26 @@ def EveField(name, schema, klass):
 
     # validator = Validator({"value": schema})
 
-    def _validate(self, val):
+    @property
+    def validator(self):
+        # one validator per thread, validators are not thread safe
+        local = type(self)._validators
+        if getattr(local, "validator", None) is None:
+            local.validator = Validator({"value": schema})
+        return local.validator
+
+    def errors(self, val):
         if self.allow_None and val is None:
+            return {}
+        try:
+            if not self.validator.validate({"value": val}):
+                return dict(self.validator.errors)
+        except Exception:
+            pass
+        return {}
+
+    def _validate(self, val):
+        if trusted():
             return
 
         if self.owner is None:
@@ -51,27 +155,25 @@ def EveField(name, schema, klass):
         if self.name is None:
             return
 
-        try:
-            if not self.validator.validate({"value": val}):
-                sep = "\n"
-                errors = [
-                    f"Cannot set \'{self.owner.name}.{self.name}\' to \'{val}\' of type {type(val)}."
-                ]
-                for k, v in self.validator.errors.items():
-                    errors.append(f"{k} {v}")
-                if len(errors) <= 2:
-                    sep = ". "
-                raise ValueError(" ".join(errors))
-        except ValueError:
-            raise
-        except Exception:
-            pass
+        errors = self.errors(val)
+        if errors:
+            sep = "\n"
+            messages = [
+                f"Cannot set \'{self.owner.name}.{self.name}\' to \'{val}\' of type {type(val)}."
+            ]
+            for k, v in errors.items():
+                messages.append(f"{k} {v}")
+            if len(messages) <= 2:
+                sep = ". "
+            raise ValueError(" ".join(messages))
  
 
     params = {
         # "_schema": schema,
         "_validate": _validate,
-        "validator": Validator({"value": schema})
+        "errors": errors,
+        "validator": validator,
+        "_validators": threading.local(),
     }
 
     return type(f"Eve{name.title()}{klass.__name__}Field", (klass, ), params)
@@ -1,4 +1,3 @@
-import panel as pn
 import param
 from bson import ObjectId
 import json
@@ -6,15 +5,18 @@ from io import BytesIO
 import logging
 
 from .settings import config as settings
-from .eve_model import DefaultLayout, EveModelBase
-from .field import EveField
+from .eve_model import EveModelBase
+from .field import EveField, trusted, trusted_source
+from .media import MediaHandle
+from .result_cache import invalidate as invalidate_results
 from .session import EveSessionBase
 from .types import TYPE_MAPPING
-from .widgets import get_widget
-from .utils import NumpyJSONENncoder, to_data_dict, to_json_compliant
+from .utils import NumpyJSONENncoder, to_data_dict, to_json_compliant, schema_hash
 
 logger = logging.getLogger(__name__)
 
+_ITEM_CLASSES = {}
+
 class EveItem(EveModelBase):
     session = param.ClassSelector(EveSessionBase, constant=True, precedence=-1)
     _resource_url = param.String(precedence=-1)
@@ -50,6 +52,27 @@ class EveItem(EveModelBase):
             params["name"] = f'{self.__class__.__name__}_{params["_id"]}'
         params = {k: v for k, v in params.items() if hasattr(self, k)}
         super().__init__(**params)
+        # items built locally are created on the server by their first push
+        self._on_server = False
+        self._dirty = set()
+        fields = [k for k in self.schema if not k.startswith("_") and k in self.param]
+        if fields:
+            self.param.watch(self._mark_dirty, fields)
+
+    def _mark_dirty(self, *events):
+        # values loaded from the server are in sync, only user edits are tracked
+        if trusted():
+            return
+        self._dirty.update(event.name for event in events)
+
+    @property
+    def dirty_fields(self):
+        """Fields changed since the item was last synced with the server."""
+        return [k for k in self.schema if k in self._dirty]
+
+    @property
+    def is_dirty(self):
+        return bool(self._dirty)
 
     @classmethod
     def from_schema(cls,
@@ -58,7 +81,33 @@ class EveItem(EveModelBase):
                     resource_url,
                     session=None,
                     data={}):
-        
+        klass = cls.class_from_schema(name, schema, resource_url)
+        return klass(schema=schema,
+                     _resource_url=resource_url,
+                     session=session,
+                     **data)
+
+    @classmethod
+    def class_from_schema(cls, name, schema, resource_url):
+        """Generate an EveItem subclass for an Eve schema.
+        Generated classes are cached by schema hash and reused by
+        every client built for the same schema.
+
+        Args:
+            name (str): Name of the generated class
+            schema (dict): Eve schema of the resource
+            resource_url (str): url of the resource
+
+        Returns:
+            type: EveItem subclass with a parameter per schema field.
+        """
+        key = (name, schema_hash(schema), resource_url)
+        if key not in _ITEM_CLASSES:
+            _ITEM_CLASSES[key] = cls._make_class(name, schema, resource_url)
+        return _ITEM_CLASSES[key]
+
+    @classmethod
+    def _make_class(cls, name, schema, resource_url):
         params = dict(
             schema=param.Dict(default=schema,
                                allow_None=False,
@@ -66,17 +115,6 @@ class EveItem(EveModelBase):
                                precedence=-1),
             _resource_url=param.String(default=resource_url, precedence=-1),
         )
-        _widgets = {
-            "_etag": {
-                "type": pn.widgets.TextInput,
-                "disabled": True
-            },
-            "_version": {
-                "type": pn.widgets.IntInput,
-                "disabled": False
-            }
-        }
-
         for field_name, field_schema in schema.items():
             kwargs = {"precedence": 10}
             if field_name == "_id":
@@ -98,10 +136,6 @@ class EveItem(EveModelBase):
             else:
                 kwargs["default"] = None
 
-            widget = get_widget(extended_name, field_schema)
-            if widget is not None:
-                _widgets[field_name] = widget
-
             kwargs["allow_None"] = field_schema.get("nullable", True)
 
             bounds = (field_schema.get("min",
@@ -110,21 +144,38 @@ class EveItem(EveModelBase):
                 kwargs["bounds"] = bounds
             kwargs["readonly"] = field_schema.get("readonly", False)
             params[field_name] = class_(**kwargs)
-        params["_widgets"] = param.Dict(default=_widgets,
-                                        constant=True,
-                                        precedence=-1)
-        klass = type(name, (EveItem, ), params)
+        return type(name, (EveItem, ), params)
 
-        return klass(schema=schema,
-                     _widgets=_widgets,
-                     _resource_url=resource_url,
-                     session=session,
-                     **data)
+    @classmethod
+    def from_server(cls, **data):
+        """Instantiate from data returned by the server.
+        Field validation is skipped since the server already validated the data.
+        """
+        with trusted_source():
+            item = cls(**data)
+        item._on_server = True
+        return item
 
     @property
     def url(self):
         return "/".join([self._resource_url, self._id])
 
+    def validate(self):
+        """Validate the current field values against the schema.
+
+        Returns:
+            dict: validation errors by field name, empty if all values are valid.
+        """
+        errors = {}
+        for k in self.schema:
+            parameter = self.param[k]
+            if not hasattr(parameter, "errors"):
+                continue
+            field_errors = parameter.errors(getattr(self, k))
+            if field_errors:
+                errors[k] = field_errors.get("value", field_errors)
+        return errors
+
     def save(self):
         self.push()
 
@@ -132,7 +183,7 @@ class EveItem(EveModelBase):
         obj = {}
         for k in self.schema:
             v = getattr(self, k)
-            if exclude_files and isinstance(v, bytes):
+            if exclude_files and isinstance(v, (bytes, MediaHandle)):
                 continue
             obj[k] = v
         return obj
@@ -166,6 +217,12 @@ class EveItem(EveModelBase):
             raise KeyError(f"{key} cannot be set.")
 
     @param.depends("_version", watch=True)
+    def _version_changed(self):
+        # a version set by the user is loaded, versions set from a
+        # server response already describe the current values
+        if not trusted():
+            self.pull()
+
     def pull(self):
         if self._version is None:
             version = 1
@@ -176,17 +233,33 @@ class EveItem(EveModelBase):
         data = resp.json()
         if not data:
             return
-        for k, v in data.items():
-            if hasattr(self, k):
-                try:
-                    param = getattr(self.param, k)
-                    if param.constant or param.readonly:
-                        setattr(self, getattr(param, "_internal_name"), v)
-                    else:
-                        self.param.set_param(**{k:v})
-                except Exception as e:
-                    logger.error(str(e))
-                    pass
+        self._load(data)
+        self._on_server = True
+
+    def _load(self, data):
+        """Apply data returned by the server to the item.
+        All field updates are set in a single batch so watchers and
+        widgets are only triggered once.
+        """
+        updates = {}
+        with trusted_source():
+            for k, v in data.items():
+                if k not in self.param:
+                    continue
+                param = self.param[k]
+                if param.constant or param.readonly:
+                    setattr(self, getattr(param, "_internal_name"), v)
+                else:
+                    updates[k] = v
+            try:
+                self.param.set_param(**updates)
+            except Exception:
+                for k, v in updates.items():
+                    try:
+                        self.param.set_param(**{k: v})
+                    except Exception as e:
+                        logger.error(str(e))
+        self._dirty.difference_update(data)
     
     def get_version(self, version):
         vers = self.clone(_version=version)
@@ -201,9 +274,9 @@ class EveItem(EveModelBase):
         if not data:
             return []
         return [
-            self.__class__(**doc,
-                           session=self.session,
-                           _resource_url=self._resource_url)
+            self.__class__.from_server(**doc,
+                                       session=self.session,
+                                       _resource_url=self._resource_url)
             for doc in data.get("_items", [])
         ]
 
@@ -215,43 +288,78 @@ class EveItem(EveModelBase):
         if not data:
             return []
         return [
-            self.__class__(**doc,
-                           session=self.session,
-                           _resource_url=self._resource_url)
+            self.__class__.from_server(**doc,
+                                       session=self.session,
+                                       _resource_url=self._resource_url)
             for doc in data.get("_items", [])
         ]
 
     def push(self):
-        headers = {"Content-Type": "application/json"}
-        if self._version == self._latest_version:
-            headers["If-Match"] = self._etag
-        data = {k: getattr(self, k) for k in self.schema if not k.startswith("_")}
-        doc = {k:v for k,v in data.items() if v is not None}
-        files = {name: BytesIO(doc.pop(name)) for name, value in data.items()
-                    if isinstance(value, bytes)}
-        # data = to_data_dict(doc)
-        data = json.dumps(doc, cls=NumpyJSONENncoder)
-        with self.session.Client(headers=headers) as client:
-            resp = client.put(self.url, data=data, files=files, )
-        self.pull()
+        """Save the item. A document that is not on the server yet is
+        written in full with PUT (Eve upserts it), an existing one is
+        updated with a PATCH of the fields changed since the last sync
+        and nothing is sent if no field changed.
+
+        Returns:
+            dict: server response, None if nothing was sent
+        """
+        if not self._on_server:
+            fields = [k for k in self.schema if not k.startswith("_")
+                      and getattr(self, k) is not None]
+            return self._write("PUT", fields)
+        fields = self.dirty_fields
+        if not fields:
+            return None
+        return self.patch(*fields)
 
     def patch(self, *fields):
-        headers = {"Content-Type": "application/json"}
-        if self._version == self._latest_version:
+        """Update the given fields of the remote document, by default the
+        fields changed since the last sync. Only these fields are sent and
+        the item's _etag and _version are taken from the response, the
+        document is not read again.
+
+        Returns:
+            dict: server response
+        """
+        if not self._on_server:
+            return self.push()
+        if not fields:
+            fields = self.dirty_fields
+        return self._write("PATCH", fields)
+
+    def _write(self, method, fields):
+        headers = {}
+        if method == "PATCH" and self._etag and self._version == self._latest_version:
             headers["If-Match"] = self._etag
-            
-        data = {}
-        for k in fields:
-            data[k] = getattr(self, k)
-        doc = {k:v for k,v in data.items() if v is not None}
-        files = {name: BytesIO(doc.pop(name)) for name, value in data.items() if isinstance(value, bytes)}
-        # data = to_data_dict(doc)
-        data = json.dumps(doc, cls=NumpyJSONENncoder)
-
+        # media that was not replaced is left as is on the server
+        data = {k: getattr(self, k) for k in fields
+                if not isinstance(getattr(self, k), MediaHandle)}
+        files = {k: (k, BytesIO(v)) for k, v in data.items() if isinstance(v, bytes)}
         with self.session.Client() as client:
-            resp = client.patch(self.url, data=data, files=files, headers=headers)
+            if files:
+                form = {k: v if isinstance(v, str) else json.dumps(v, cls=NumpyJSONENncoder)
+                        for k, v in data.items() if k not in files}
+                resp = client.request(method, self.url, data=form, files=files, headers=headers)
+            else:
+                headers["Content-Type"] = "application/json"
+                resp = client.request(method, self.url,
+                                      content=json.dumps(data, cls=NumpyJSONENncoder),
+                                      headers=headers)
             resp.raise_for_status()
-        self.pull()
+        invalidate_results(self._resource_url)
+        result = resp.json()
+        meta = {k: result[k] for k in ("_etag", "_version", "_latest_version", "_updated")
+                if k in result}
+        if "_version" in meta and "_latest_version" not in meta:
+            meta["_latest_version"] = meta["_version"]
+        self._load(meta)
+        self._on_server = True
+        self._dirty.difference_update(fields)
+        for k in self.schema:
+            v = getattr(self, k, None)
+            if isinstance(v, MediaHandle):
+                v.release(etag=self._etag)
+        return result
 
     def delete(self, verification=None):
         if verification is not None and verification != self._id:
@@ -263,6 +371,7 @@ class EveItem(EveModelBase):
         with self.session.Client() as client:
             resp = client.delete(self.url, headers=headers)
             self._deleted = True
+        invalidate_results(self._resource_url)
         return self._deleted
 
     # def clone(self, **kwargs):
@@ -272,6 +381,7 @@ class EveItem(EveModelBase):
 
     @param.depends("_delete_requested")
     def buttons(self):
+        import panel as pn
         param_buttons = pn.Param(self.param,
                            parameters=["_reload", "_save"],
                            widgets={
@@ -312,6 +422,8 @@ class EveItem(EveModelBase):
         return row
 
     def make_panel(self):
+        import panel as pn
+        from .widgets import DefaultLayout, item_widgets
         header = pn.Column(
             pn.layout.Divider(),
             f"### {self.name}",
@@ -325,7 +437,7 @@ class EveItem(EveModelBase):
         editors = pn.Param(self.param,
                            show_name=False,
                            default_layout=DefaultLayout,
-                           widgets=self._widgets,
+                           widgets=item_widgets(self.__class__.__name__, self.schema),
                            parameters=list(self.schema)+settings.META_FIELDS,
                            width_policy='max',
                            sizing_mode=self.sizing_mode,
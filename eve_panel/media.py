@@ -0,0 +1,255 @@
+"""
+Media
+=====
+Lazy access to media fields. Documents are listed without their media,
+each media field is represented by a MediaHandle that downloads the
+content on first access, streams it in chunks and keeps decoded bytes
+in a process wide cache bounded by settings.MEDIA_CACHE_MAX_BYTES.
+"""
+
+import base64
+import binascii
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .settings import config as settings
+
+URL_PATTERN = re.compile(r"^(https?://|/)")
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+UNFETCHED = object()
+
+
+class MediaCache:
+    """Least recently used cache of decoded media content.
+
+    Args:
+        max_bytes (int, optional): total size of the cached content.
+                    Defaults to settings.MEDIA_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or settings.MEDIA_CACHE_MAX_BYTES
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.nbytes -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def discard(self, key):
+        with self._lock:
+            if key in self.entries:
+                self.nbytes -= len(self.entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+def media_cache():
+    """The cache shared by all media handles."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = MediaCache()
+        return _CACHE
+
+
+def is_media_url(value):
+    """Whether a media value returned by Eve is a URL (RETURN_MEDIA_AS_URL)
+    rather than base64 content. Relative URLs are told apart from base64
+    strings starting with "/" by failing to decode as base64.
+    """
+    if not isinstance(value, str) or not URL_PATTERN.match(value):
+        return False
+    if value.startswith(("http://", "https://")):
+        return True
+    try:
+        base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return True
+    return False
+
+
+class MediaReader(io.RawIOBase):
+    """Read only file object over the content of a media handle, streamed
+    with :meth:`MediaHandle.iter_bytes`.
+    """
+
+    def __init__(self, handle, chunk_size=1 << 20):
+        self.name = handle.field
+        self._chunks = handle.iter_bytes(chunk_size)
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not len(self._buffer):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        self._chunks.close()
+        super().close()
+
+
+class MediaHandle:
+    """Media field of a document, downloaded on access.
+
+    Args:
+        session (EveSessionBase): session used for the requests
+        item_url (str): url of the document
+        field (str): name of the media field
+        value (str, optional): base64 content or media URL if already known
+        cache (MediaCache, optional): cache of decoded content. Defaults to
+                    the shared :func:`media_cache`.
+        etag (str, optional): _etag of the document, part of the cache key so
+                    content cached for an older version is not returned.
+    """
+
+    def __init__(self, session, item_url, field, value=None, cache=None, etag=None):
+        self.session = session
+        self.item_url = item_url
+        self.field = field
+        self.value = UNFETCHED if value is None else value
+        self.cache = cache if cache is not None else media_cache()
+        self.etag = etag
+        self._lock = threading.Lock()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"MediaHandle({self.item_url!r}, {self.field!r})"
+
+    def __bytes__(self):
+        return self.read() or b""
+
+    @property
+    def key(self):
+        return (getattr(self.session, "server_url", None), self.item_url, self.field, self.etag)
+
+    @property
+    def cached(self):
+        return self.cache.get(self.key) is not None
+
+    def source(self):
+        """Base64 content or URL of the media, fetching the document
+        with only this field if it is not known yet.
+        """
+        with self._lock:
+            if self.value is UNFETCHED:
+                with self.session.Client() as client:
+                    resp = client.get(self.item_url,
+                                      params={"projection": json.dumps({self.field: 1})})
+                    resp.raise_for_status()
+                    data = resp.json()
+                    self.value = data.get(self.field)
+                    self.etag = data.get("_etag", self.etag)
+            return self.value
+
+    def iter_bytes(self, chunk_size=1 << 20):
+        """Iterate over the media content in chunks of about chunk_size bytes.
+        Media served as URL is streamed from the server, base64 content
+        is decoded chunk by chunk.
+        """
+        data = self.cache.get(self.key)
+        if data is not None:
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+            return
+        value = self.source()
+        if value is None:
+            return
+        if is_media_url(value):
+            with self.session.Client() as client:
+                with client.stream("GET", value) as resp:
+                    resp.raise_for_status()
+                    yield from resp.iter_bytes(chunk_size)
+            return
+        # 4 base64 characters decode to 3 bytes
+        step = max(chunk_size // 3, 1) * 4
+        for i in range(0, len(value), step):
+            yield base64.b64decode(value[i:i + step])
+
+    def read(self):
+        """Content of the media as bytes, None if the document has none.
+        """
+        data = self.cache.get(self.key)
+        if data is not None:
+            return data
+        if self.source() is None:
+            return None
+        data = b"".join(self.iter_bytes())
+        self.cache.put(self.key, data)
+        with self._lock:
+            if self.cached and not is_media_url(self.value):
+                # the decoded bytes are cached, the base64 copy is dropped
+                self.value = UNFETCHED
+        return data
+
+    def open(self, chunk_size=1 << 20):
+        """File object streaming the media content, see :class:`MediaReader`."""
+        return MediaReader(self, chunk_size=chunk_size)
+
+    def to_file(self, target, chunk_size=1 << 20):
+        """Write the media content to a file path or file object.
+
+        Returns:
+            int: number of bytes written
+        """
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, "wb") as f:
+                return self.to_file(f, chunk_size=chunk_size)
+        n = 0
+        for chunk in self.iter_bytes(chunk_size):
+            target.write(chunk)
+            n += len(chunk)
+        return n
+
+    def release(self, etag=None):
+        """Drop the downloaded content from memory. After the document
+        was written, etag is its new _etag.
+        """
+        self.cache.discard(self.key)
+        with self._lock:
+            self.value = UNFETCHED
+            if etag is not None:
+                self.etag = etag
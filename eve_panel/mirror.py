@@ -0,0 +1,498 @@
+"""
+Mirror
+======
+Local stores holding a copy of a remote resource, kept up to date
+with :meth:`eve_panel.EveResource.sync`.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from .columnar import EVE_DATE_FORMAT, META_SCHEMA
+from .exceptions import UnsupportedQuery
+from .query import load_param, match, project, sort_documents, sort_keys
+from .utils import NumpyJSONENncoder, has_next_page
+
+
+def load_where(where):
+    """Mongo query of a where parameter, python syntax queries
+    are only evaluated by the server.
+    """
+    where = load_param(where, {})
+    if not isinstance(where, dict):
+        raise UnsupportedQuery(f"Python syntax query {where!r} cannot be evaluated locally.")
+    return where
+
+
+def parse_updated(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, EVE_DATE_FORMAT)
+    return value
+
+
+class LocalStore:
+    """Base class for local copies of a resource.
+    Stores hold documents by _id plus a few named state values,
+    e.g. the _updated high-water mark of the last sync.
+    """
+
+    def upsert(self, docs):
+        """Insert or replace documents, matched by _id.
+        """
+        raise NotImplementedError
+
+    def delete(self, ids):
+        """Remove documents by _id, unknown ids are ignored.
+        """
+        raise NotImplementedError
+
+    def get(self, _id):
+        raise NotImplementedError
+
+    def documents(self):
+        """Iterate over all stored documents.
+        """
+        raise NotImplementedError
+
+    def get_state(self, key, default=None):
+        raise NotImplementedError
+
+    def set_state(self, key, value):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def query(self, where=None, projection=None, sort=None, max_results=25, page=1, **kwargs):
+        """Answer a resource GET from the local copy.
+
+        Args:
+            where (Union[dict,str], optional): Mongo query
+            projection (Union[dict,str], optional): Mongo projection
+            sort (str, optional): Eve sort string, e.g. "city,-lastname"
+            max_results (int, optional): page size. Defaults to 25.
+            page (int, optional): page number. Defaults to 1.
+
+        Returns:
+            dict: response shaped like Eve's, with _items and _meta
+
+        Raises:
+            UnsupportedQuery: where is a python syntax query
+        """
+        where = load_where(where)
+        projection = load_param(projection, {})
+        max_results = int(max_results or 25)
+        page = int(page or 1)
+        offset = (page - 1) * max_results
+        docs = [doc for doc in self.documents() if match(doc, where)]
+        docs = sort_documents(docs, sort)
+        return {
+            "_items": [project(doc, projection) for doc in docs[offset:offset + max_results]],
+            "_meta": {"total": len(docs), "page": page, "max_results": max_results},
+        }
+
+    def __len__(self):
+        return sum(1 for _ in self.documents())
+
+    def __copy__(self):
+        # stores are shared, not copied, when a resource is cloned
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class MemoryStore(LocalStore):
+    """Store keeping documents in a dict, lost when the process exits.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.state = {}
+
+    def upsert(self, docs):
+        for doc in docs:
+            self.docs[doc["_id"]] = dict(doc)
+
+    def delete(self, ids):
+        for _id in ids:
+            self.docs.pop(_id, None)
+
+    def get(self, _id):
+        return self.docs.get(_id)
+
+    def documents(self):
+        yield from self.docs.values()
+
+    def get_state(self, key, default=None):
+        return self.state.get(key, default)
+
+    def set_state(self, key, value):
+        self.state[key] = value
+
+    def clear(self):
+        self.docs = {}
+        self.state = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+
+SQL_TYPES = {
+    "boolean": "INTEGER",
+    "integer": "INTEGER",
+    "float": "REAL",
+    "number": "REAL",
+    "binary": "BLOB",
+    "media": "BLOB",
+}
+
+JSON_TYPES = ("dict", "list", "set")
+
+DATE_TYPES = ("date", "datetime")
+
+SQL_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+COMPARISONS = {
+    "$eq": "=",
+    "$gt": ">",
+    "$gte": ">=",
+    "$lt": "<",
+    "$lte": "<=",
+}
+
+
+def quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def regexp(pattern, value):
+    return value is not None and re.search(pattern, str(value)) is not None
+
+
+class SQLiteStore(LocalStore):
+    """Store mirroring a resource into an SQLite table,
+    one column per schema field, nested fields are stored as json.
+
+    Args:
+        schema (dict): Eve schema of the resource
+        path (str, optional): database file. Defaults to ":memory:".
+        table (str, optional): table name. Defaults to "documents".
+    """
+
+    def __init__(self, schema, path=":memory:", table="documents"):
+        self.schema = dict(META_SCHEMA, **schema)
+        self.path = path
+        self.table = table
+        self.columns = list(self.schema)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.create_function("REGEXP", 2, regexp)
+        self.create_tables()
+
+    def is_at(self, path):
+        """Whether this store is the database file at path."""
+        if ":memory:" in (path, self.path):
+            return path == self.path
+        return os.path.abspath(path) == os.path.abspath(self.path)
+
+    def create_tables(self):
+        columns = []
+        for name in self.columns:
+            kind = self.schema[name].get("type", "string")
+            sql_type = SQL_TYPES.get(kind, "TEXT")
+            if name == "_id":
+                sql_type += " PRIMARY KEY"
+            columns.append(f"{quote(name)} {sql_type}")
+        with self._lock, self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {quote(self.table)} ({', '.join(columns)})")
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {quote(self.table + '__state')} "
+                              "(key TEXT PRIMARY KEY, value TEXT)")
+
+    def field_type(self, name):
+        return self.schema.get(name, {}).get("type", "string")
+
+    def encode(self, name, value):
+        if value is None:
+            return None
+        kind = self.field_type(name)
+        if kind in JSON_TYPES:
+            return json.dumps(value, cls=NumpyJSONENncoder)
+        if kind in DATE_TYPES:
+            try:
+                value = parse_updated(value)
+            except ValueError:
+                return value
+            if isinstance(value, datetime):
+                return value.strftime(SQL_DATE_FORMAT)
+            return value
+        if kind == "boolean":
+            return int(bool(value))
+        return value
+
+    def decode(self, name, value):
+        if value is None:
+            return None
+        kind = self.field_type(name)
+        if kind in JSON_TYPES:
+            return json.loads(value)
+        if kind in DATE_TYPES:
+            return datetime.strptime(value, SQL_DATE_FORMAT).strftime(EVE_DATE_FORMAT)
+        if kind == "boolean":
+            return bool(value)
+        return value
+
+    def row_to_doc(self, row):
+        return {name: self.decode(name, value)
+                for name, value in zip(self.columns, row) if value is not None}
+
+    def upsert(self, docs):
+        names = ", ".join(quote(name) for name in self.columns)
+        marks = ", ".join("?" for _ in self.columns)
+        rows = [[self.encode(name, doc.get(name)) for name in self.columns] for doc in docs]
+        with self._lock, self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {quote(self.table)} ({names}) "
+                                  f"VALUES ({marks})", rows)
+
+    def delete(self, ids):
+        with self._lock, self.conn:
+            self.conn.executemany(f"DELETE FROM {quote(self.table)} WHERE _id = ?",
+                                  [(_id, ) for _id in ids])
+
+    def get(self, _id):
+        with self._lock:
+            row = self.conn.execute(f"SELECT * FROM {quote(self.table)} WHERE _id = ?",
+                                    (_id, )).fetchone()
+        return None if row is None else self.row_to_doc(row)
+
+    def documents(self):
+        with self._lock:
+            rows = self.conn.execute(f"SELECT * FROM {quote(self.table)}").fetchall()
+        for row in rows:
+            yield self.row_to_doc(row)
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute(f"SELECT value FROM {quote(self.table + '__state')} "
+                                    "WHERE key = ?", (key, )).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_state(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO {quote(self.table + '__state')} "
+                              "VALUES (?, ?)", (key, json.dumps(value)))
+
+    def clear(self):
+        with self._lock, self.conn:
+            self.conn.execute(f"DELETE FROM {quote(self.table)}")
+            self.conn.execute(f"DELETE FROM {quote(self.table + '__state')}")
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {quote(self.table)}").fetchone()[0]
+
+    def column_sql(self, path):
+        """SQL expression for a field, dotted paths are looked up in json columns.
+        """
+        name, _, rest = path.partition(".")
+        if name not in self.schema:
+            raise UnsupportedQuery(f"Unknown field {name}")
+        if rest:
+            if self.field_type(name) not in JSON_TYPES:
+                raise UnsupportedQuery(f"Field {name} has no nested values")
+            return f"json_extract({quote(name)}, ?)", [f"$.{rest}"]
+        return quote(name), []
+
+    def condition_sql(self, path, condition):
+        column, args = self.column_sql(path)
+        name = path.partition(".")[0]
+        nested = "." in path
+
+        def value(v):
+            return v if nested else self.encode(name, v)
+
+        if not isinstance(condition, dict) or not any(k.startswith("$") for k in condition):
+            if not nested and self.field_type(name) in ("list", "set") \
+                    and not isinstance(condition, (list, dict)):
+                return (f"EXISTS (SELECT 1 FROM json_each({column}) WHERE value = ?)",
+                        args + [condition])
+            if condition is None:
+                return f"{column} IS NULL", args
+            return f"{column} = ?", args + [value(condition)]
+
+        clauses, params = [], []
+        for op, operand in condition.items():
+            if op in COMPARISONS:
+                clauses.append(f"{column} {COMPARISONS[op]} ?")
+                params += args + [value(operand)]
+            elif op == "$ne":
+                clauses.append(f"({column} IS NULL OR {column} != ?)")
+                params += args + args + [value(operand)]
+            elif op in ("$in", "$nin"):
+                operand = list(operand)
+                if not operand:
+                    clauses.append("0" if op == "$in" else "1")
+                    continue
+                marks = ", ".join("?" for _ in operand)
+                if op == "$in":
+                    clauses.append(f"{column} IN ({marks})")
+                    params += args + [value(v) for v in operand]
+                else:
+                    clauses.append(f"({column} IS NULL OR {column} NOT IN ({marks}))")
+                    params += args + args + [value(v) for v in operand]
+            elif op == "$exists":
+                clauses.append(f"{column} IS {'NOT ' if operand else ''}NULL")
+                params += args
+            elif op == "$regex":
+                pattern = operand
+                if "i" in condition.get("$options", ""):
+                    pattern = f"(?i){pattern}"
+                clauses.append(f"REGEXP(?, {column})")
+                params += [pattern] + args
+            elif op == "$options":
+                continue
+            else:
+                raise UnsupportedQuery(f"Operator {op} is not supported locally.")
+        return " AND ".join(clauses) or "1", params
+
+    def where_sql(self, query):
+        """Translate a Mongo query into an SQL WHERE clause and its parameters.
+
+        Raises:
+            UnsupportedQuery: the query uses operators that have no translation
+        """
+        clauses, params = [], []
+        for key, condition in query.items():
+            if key in ("$and", "$or", "$nor"):
+                parts = [self.where_sql(q) for q in condition]
+                if not parts:
+                    continue
+                joined = f" {'AND' if key == '$and' else 'OR'} ".join(f"({c})" for c, _ in parts)
+                clauses.append(f"NOT ({joined})" if key == "$nor" else f"({joined})")
+                params += [p for _, ps in parts for p in ps]
+            elif key.startswith("$"):
+                raise UnsupportedQuery(f"Operator {key} is not supported locally.")
+            else:
+                clause, ps = self.condition_sql(key, condition)
+                clauses.append(clause)
+                params += ps
+        return " AND ".join(clauses) or "1", params
+
+    def order_sql(self, sort):
+        clauses, params = [], []
+        for name, direction in sort_keys(sort):
+            column, args = self.column_sql(name)
+            clauses.append(f"{column} {'DESC' if direction < 0 else 'ASC'}")
+            params += args
+        clauses.append("_id ASC")
+        return ", ".join(clauses), params
+
+    def query(self, where=None, projection=None, sort=None, max_results=25, page=1, **kwargs):
+        where = load_where(where)
+        projection = load_param(projection, {})
+        max_results = int(max_results or 25)
+        page = int(page or 1)
+        offset = (page - 1) * max_results
+        order_clause, order_params = self.order_sql(sort)
+        table = quote(self.table)
+        try:
+            where_clause, where_params = self.where_sql(where)
+        except UnsupportedQuery:
+            # no SQL translation, filter the ordered table with the local matcher
+            with self._lock:
+                rows = self.conn.execute(f"SELECT * FROM {table} ORDER BY {order_clause}",
+                                         order_params).fetchall()
+            docs = [doc for doc in map(self.row_to_doc, rows) if match(doc, where)]
+            total = len(docs)
+            docs = docs[offset:offset + max_results]
+        else:
+            with self._lock:
+                total = self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where_clause}",
+                                          where_params).fetchone()[0]
+                rows = self.conn.execute(f"SELECT * FROM {table} WHERE {where_clause} "
+                                         f"ORDER BY {order_clause} LIMIT ? OFFSET ?",
+                                         where_params + order_params
+                                         + [max_results, offset]).fetchall()
+            docs = [self.row_to_doc(row) for row in rows]
+        items = [project(doc, projection) for doc in docs]
+        return {
+            "_items": items,
+            "_meta": {"total": total, "page": page, "max_results": max_results},
+        }
+
+
+def keyset_query(query, updated, _id):
+    """query restricted to the documents after (updated, _id) in _updated, _id order."""
+    after = {"$or": [{"_updated": {"$gt": updated}},
+                     {"_updated": updated, "_id": {"$gt": _id}}]}
+    return {"$and": [query, after]} if query else after
+
+
+def sync_resource(resource, store, soft_delete=None, max_results=None, timeout=None):
+    """Apply the changes made to a remote resource since the last sync to store.
+
+    Only documents with an _updated timestamp at or after the stored
+    high-water mark are requested. _updated has a resolution of one second,
+    so the boundary second is fetched again, upserts make this harmless.
+    Pages are requested by keyset on (_updated, _id) rather than by page
+    number, documents updated during the sync cannot shift the pages.
+
+    Args:
+        resource (EveResource): remote resource
+        store (LocalStore): local copy of the resource
+        soft_delete (bool, optional): request soft deleted documents and remove them from
+                            the store. Defaults to the soft_delete setting of the resource.
+        max_results (int, optional): page size. Defaults to the resource items_per_page.
+
+    Returns:
+        dict: number of upserted and deleted documents and the new high-water mark
+    """
+    if resource.session.offline:
+        raise ConnectionError(f"Cannot sync {resource.name} while the session is offline.")
+    if soft_delete is None:
+        soft_delete = resource._resource_def.get("soft_delete", False)
+    max_results = max_results or resource.items_per_page
+    high_water = store.get_state("_updated")
+    query = dict(resource.filters)
+    if high_water:
+        # combined with, not replacing, an _updated filter of the resource
+        since = {"_updated": {"$gte": high_water}}
+        query = {"$and": [query, since]} if query else since
+    params = dict(projection={name: 0 for name in resource._file_fields},
+                  sort="_updated,_id",
+                  max_results=max_results)
+    if soft_delete:
+        params["show_deleted"] = "true"
+
+    upserted = deleted = 0
+    latest = parse_updated(high_water)
+    where = query
+    while True:
+        resp = resource.get(where=where, page=1, timeout=timeout, use_cache=False, **params)
+        if "_error" in resp:
+            raise ValueError(f"Sync of {resource.name} failed: {resp['_error']}")
+        docs = resp.get("_items", [])
+        if not docs:
+            break
+        removed = [doc["_id"] for doc in docs if doc.get("_deleted")]
+        changed = [doc for doc in docs if not doc.get("_deleted")]
+        store.delete(removed)
+        store.upsert(changed)
+        upserted += len(changed)
+        deleted += len(removed)
+        for doc in docs:
+            updated = parse_updated(doc.get("_updated"))
+            if updated is not None and (latest is None or updated > latest):
+                latest = updated
+        if not has_next_page(resp):
+            break
+        where = keyset_query(query, docs[-1]["_updated"], docs[-1]["_id"])
+
+    if latest is not None:
+        high_water = latest.strftime(EVE_DATE_FORMAT)
+        store.set_state("_updated", high_water)
+    return {"upserted": upserted, "deleted": deleted, "high_water": high_water}
@@ -1,15 +1,16 @@
 from io import BytesIO, StringIO
 import json
-import panel as pn
 import param
 
 from .settings import config as settings
+from .columnar import ColumnBuilder
 from .eve_model import EveModelBase
 from .item import EveItem
 from .utils import NumpyJSONENncoder, to_data_dict, to_json_compliant
 
 class EvePage(EveModelBase):
     fields = param.List(default=["_id"])
+    schema = param.Dict(default={}, precedence=-1)
     _items = param.Dict(default={})
 
     def __getitem__(self, key):
@@ -50,7 +51,7 @@ class EvePage(EveModelBase):
 
     def to_file(self, indent=4):
         docs = self.to_records()
-        f = StringIO(json.dumps(docs, indent=indent))
+        f = StringIO(json.dumps(docs, indent=indent, cls=NumpyJSONENncoder))
         return f
 
     def records(self):
@@ -58,12 +59,9 @@ class EvePage(EveModelBase):
             yield item.to_dict()
 
     def to_dataframe(self):
-        import pandas as pd
-
-        df = pd.DataFrame(self.to_records(), columns=self.fields)
-        if "_id" in df.columns:
-            df = df.set_index("_id")
-        return df
+        builder = ColumnBuilder(self.schema, self.fields)
+        builder.append_items(self.values())
+        return builder.to_dataframe()
 
     def push(self, names=None):
         if names is None:
@@ -79,6 +77,7 @@ class EvePage(EveModelBase):
 
     @param.depends("_items")
     def widgets_view(self):
+        import panel as pn
         if not len(self._items):
             return pn.Column("## No items to display.")
 
@@ -94,6 +93,7 @@ class EvePage(EveModelBase):
 
     @param.depends("_items")
     def table_view(self):
+        import panel as pn
         if not len(self._items):
             return pn.Column("## No items to display.")
         df = self.to_dataframe()
@@ -107,6 +107,7 @@ class EvePage(EveModelBase):
 
     @param.depends("_items")
     def json_view(self):
+        import panel as pn
         return pn.pane.JSON(self.to_json(),
                             theme="light",
                             width_policy='max',
@@ -116,6 +117,7 @@ class EvePage(EveModelBase):
                             height=int(settings.GUI_HEIGHT - 30))
 
     def make_panel(self):
+        import panel as pn
         tabs = pn.Tabs(("Table", self.table_view),
                        ("Widgets", self.widgets_view),
                        ("JSON", self.json_view),
@@ -147,6 +149,7 @@ class PageZero(EvePage):
         return self.panel()
 
     def panel(self):
+        import panel as pn
         return pn.Column(
             pn.layout.Divider(),
             "### You are on the landing page for this resource, no data here.",
@@ -0,0 +1,347 @@
+"""
+Query
+=====
+Client side evaluation of the Mongo query subset Eve accepts in `where`.
+"""
+
+import json
+import numbers
+import re
+from datetime import datetime
+
+from .columnar import EVE_DATE_FORMAT
+from .exceptions import UnsupportedQuery
+
+DATE_PATTERN = re.compile(r"^[A-Z][a-z]{2}, \d{2} [A-Z][a-z]{2} \d{4} \d{2}:\d{2}:\d{2} GMT$")
+
+MISSING = object()
+
+
+def normalize(value):
+    """Eve sends dates as RFC 1123 strings, compare them as datetimes.
+    """
+    if isinstance(value, str) and DATE_PATTERN.match(value):
+        try:
+            return datetime.strptime(value, EVE_DATE_FORMAT)
+        except ValueError:
+            return value
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None) - value.utcoffset()
+    return value
+
+
+def type_bracket(value):
+    """Values are only compared to values of the same bracket,
+    brackets are ordered as in Mongo's sort order.
+    """
+    if value is None or value is MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, numbers.Number):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (list, tuple)):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    return 8
+
+
+def get_values(doc, path):
+    """All values found at a dotted path, arrays along the path are expanded.
+    MISSING is returned if the path does not exist.
+    """
+    values = [doc]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                else:
+                    found.extend(v[part] for v in value if isinstance(v, dict) and part in v)
+        values = found
+    return values if values else [MISSING]
+
+
+def candidates(values):
+    """Values compared against a condition, array values also match by element.
+    """
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def equals(a, b):
+    if a is MISSING:
+        return b is None
+    return normalize(a) == normalize(b) and type_bracket(normalize(a)) == type_bracket(normalize(b))
+
+
+def compare(a, b, op):
+    if a is MISSING or a is None or b is None:
+        return False
+    a, b = normalize(a), normalize(b)
+    if type_bracket(a) != type_bracket(b):
+        return False
+    try:
+        if op == "$gt":
+            return a > b
+        if op == "$gte":
+            return a >= b
+        if op == "$lt":
+            return a < b
+        return a <= b
+    except TypeError:
+        return False
+
+
+def regex_match(value, pattern, options=""):
+    if not isinstance(value, str):
+        return False
+    flags = 0
+    for option, flag in (("i", re.I), ("m", re.M), ("s", re.S), ("x", re.X)):
+        if option in options:
+            flags |= flag
+    return re.search(pattern, value, flags) is not None
+
+
+def match_operator(values, op, operand, condition):
+    if op == "$eq":
+        return any(equals(v, operand) for v in candidates(values))
+    if op == "$ne":
+        return not any(equals(v, operand) for v in candidates(values))
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        return any(compare(v, operand, op) for v in candidates(values))
+    if op == "$in":
+        return any(equals(v, o) for v in candidates(values) for o in operand)
+    if op == "$nin":
+        return not any(equals(v, o) for v in candidates(values) for o in operand)
+    if op == "$exists":
+        return (values != [MISSING]) == bool(operand)
+    if op == "$regex":
+        return any(regex_match(v, operand, condition.get("$options", "")) for v in candidates(values))
+    if op == "$options":
+        return True
+    if op == "$size":
+        return any(isinstance(v, list) and len(v) == operand for v in values)
+    if op == "$all":
+        return any(isinstance(v, list) and all(any(equals(e, o) for e in v) for o in operand)
+                   for v in values)
+    if op == "$elemMatch":
+        return any(isinstance(v, list) and any(
+            match(e, operand) if isinstance(e, dict) else match_condition([e], operand)
+            for e in v) for v in values)
+    if op == "$not":
+        return not match_condition(values, operand)
+    raise UnsupportedQuery(f"Operator {op} cannot be evaluated locally.")
+
+
+def is_operator_dict(condition):
+    return isinstance(condition, dict) and bool(condition) \
+        and all(k.startswith("$") for k in condition)
+
+
+def match_condition(values, condition):
+    if is_operator_dict(condition):
+        return all(match_operator(values, op, operand, condition)
+                   for op, operand in condition.items())
+    if isinstance(condition, dict) and condition.get("$regex") is not None:
+        return match_operator(values, "$regex", condition["$regex"], condition)
+    return any(equals(v, condition) for v in candidates(values))
+
+
+def match(doc, query):
+    """Whether a document matches a Mongo query.
+
+    Args:
+        doc (dict): document
+        query (dict): Mongo query, as sent in Eve's `where` parameter
+
+    Raises:
+        UnsupportedQuery: query uses operators that cannot be evaluated locally
+
+    Returns:
+        bool: True if the document matches
+    """
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(match(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(match(doc, q) for q in condition):
+                return False
+        elif key == "$nor":
+            if any(match(doc, q) for q in condition):
+                return False
+        elif key.startswith("$"):
+            raise UnsupportedQuery(f"Operator {key} cannot be evaluated locally.")
+        elif not match_condition(get_values(doc, key), condition):
+            return False
+    return True
+
+
+def load_param(value, default):
+    """Query parameters may arrive json encoded, as sent to the server.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def sort_keys(sort):
+    """Parse an Eve sort parameter into (field, direction) pairs.
+    """
+    sort = load_param(sort, [])
+    if isinstance(sort, str):
+        return [(k.lstrip("-"), -1 if k.startswith("-") else 1)
+                for k in sort.split(",") if k.strip()]
+    return [(k, int(v)) for k, v in sort]
+
+
+PROJECTED_META_FIELDS = ("_id", "_etag", "_updated", "_created")
+
+
+def project(doc, projection):
+    """Apply a Mongo projection to a document, the way Eve returns it.
+    """
+    if not projection:
+        return doc
+    if any(projection.values()):
+        keep = {k for k, v in projection.items() if v} | set(PROJECTED_META_FIELDS)
+        return {k: v for k, v in doc.items() if k in keep}
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+def covers(projection, requested):
+    """Whether documents fetched with projection contain every field
+    a request with the requested projection returns.
+    """
+    if not projection:
+        return True
+    included = {k for k, v in projection.items() if v}
+    excluded = {k for k, v in projection.items() if not v}
+    if requested and any(requested.values()):
+        wanted = {k for k, v in requested.items() if v} - set(PROJECTED_META_FIELDS)
+        if included:
+            return wanted <= included
+        return not wanted & excluded
+    if included:
+        return False
+    return excluded <= {k for k, v in (requested or {}).items() if not v}
+
+
+def sort_value(value):
+    """Key ordering a single value the way Mongo does across types.
+    """
+    value = normalize(value)
+    bracket = type_bracket(value)
+    if bracket == 0:
+        return (bracket, 0)
+    if bracket == 3:
+        return (bracket, json.dumps(value, sort_keys=True, default=str))
+    if bracket == 4:
+        return (bracket, tuple(sort_value(v) for v in value))
+    if bracket == 8:
+        return (bracket, str(value))
+    return (bracket, value)
+
+
+def sort_key(doc, path, direction):
+    """Sort key of a document for one field. Arrays sort by their smallest
+    element ascending and their largest descending, empty arrays first.
+    """
+    values = []
+    for value in get_values(doc, path):
+        if isinstance(value, list):
+            if not value:
+                values.append((-1, 0))
+            values.extend(sort_value(v) for v in value)
+        else:
+            values.append(sort_value(value))
+    return min(values) if direction > 0 else max(values)
+
+
+def sort_documents(docs, sort):
+    """Stable multi-key sort matching Mongo ordering.
+
+    Args:
+        docs (list): documents
+        sort (Union[str, list]): Eve sort string e.g. "city,-lastname"
+                                or list of (field, direction) pairs
+
+    Returns:
+        list: sorted documents
+    """
+    docs = list(docs)
+    for path, direction in reversed(sort_keys(sort)):
+        keys = simple_sort_keys(docs, path)
+        if keys is None:
+            keys = [sort_key(doc, path, direction) for doc in docs]
+        order = sorted(range(len(docs)), key=keys.__getitem__, reverse=direction < 0)
+        docs = [docs[i] for i in order]
+    return docs
+
+
+def simple_sort_keys(docs, path):
+    """Sort keys for a top level field holding only numbers or only
+    plain strings, which are ordered by value without type brackets.
+    """
+    if "." in path:
+        return None
+    values = [doc.get(path) for doc in docs]
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds <= {int, float} and not (kinds == {str} and not any(
+            DATE_PATTERN.match(v) for v in values if v is not None)):
+        return None
+    if any(v is None for v in values):
+        return [(0, 0) if v is None else (1, v) for v in values]
+    return values
+
+
+def query_fields(query):
+    """Top level fields a query refers to.
+    """
+    fields = set()
+    for key, condition in query.items():
+        if key in ("$and", "$or", "$nor"):
+            for q in condition:
+                fields |= query_fields(q)
+        elif not key.startswith("$"):
+            fields.add(key.partition(".")[0])
+    return fields
+
+
+def query_key(query):
+    return json.dumps(query or {}, sort_keys=True, default=str)
+
+
+def implies(query, superset):
+    """Whether every document matching query also matches superset,
+    judged conservatively from the structure of the two queries.
+    """
+    if not superset:
+        return True
+    if query_key(query) == query_key(superset):
+        return True
+    conditions = [query] + [q for q in query.get("$and", []) if isinstance(q, dict)]
+    for key, condition in superset.items():
+        expected = query_key({key: condition})
+        if not any(key in q and query_key({key: q[key]}) == expected for q in conditions):
+            return False
+    return True
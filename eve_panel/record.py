@@ -0,0 +1,191 @@
+"""
+Eve record
+==========
+Lightweight schema typed documents for bulk data access.
+"""
+
+import json
+from io import BytesIO
+
+from .media import MediaHandle
+from .result_cache import invalidate as invalidate_results
+from .types import RECORD_DECODERS
+from .utils import NumpyJSONENncoder, schema_hash
+
+RECORD_META_FIELDS = ("_id", "_etag", "_version", "_latest_version", "_created", "_updated")
+
+_RECORD_CLASSES = {}
+
+
+class EveRecord:
+    """Compact alternative to EveItem for bulk data work.
+    Should be generated from an Eve schema:
+        EveRecord.from_schema(name, schema, resource_url)
+
+    Field values are stored in __slots__, no parameters, watchers or
+    widgets are created so records are cheap to build and hold in memory.
+    Values are decoded by their schema type, datetime fields to datetime
+    objects and media fields to bytes, other values such as objectids and
+    the meta fields are kept as the server sent them.
+    A field named like a record attribute, e.g. schema or keys, is stored
+    in a slot with a trailing underscore (record.schema_), record["schema"]
+    reads and writes it under its own name. Documents with such fields
+    are passed as data: EveRecord(session=session, data=doc).
+    """
+    __slots__ = ("session", )
+
+    schema = {}
+    _resource_url = ""
+    _fields = ()
+    _slots = {}
+    _defaults = {}
+    _decoders = {}
+    _media = ()
+
+    def __init__(self, session=None, data=None, **fields):
+        if data is None:
+            data = fields
+        elif fields:
+            data = dict(data, **fields)
+        self.session = session
+        decoders = self._decoders
+        defaults = self._defaults
+        for k, slot in self._slots.items():
+            v = data.get(k, defaults.get(k))
+            if v is not None and k in decoders:
+                v = decoders[k](v)
+            setattr(self, slot, v)
+        if self._media and session is not None and self._id:
+            for k in self._media:
+                if self._get(k) is None:
+                    self._set(k, MediaHandle(session, self.url, k, etag=self._etag))
+
+    @classmethod
+    def from_schema(cls, name, schema, resource_url):
+        """Generate a record class for an Eve schema.
+
+        Args:
+            name (str): Name of the generated class
+            schema (dict): Eve schema of the resource
+            resource_url (str): url of the resource
+
+        Returns:
+            type: EveRecord subclass with one slot per field.
+        """
+        key = (name, schema_hash(schema), resource_url)
+        if key not in _RECORD_CLASSES:
+            _RECORD_CLASSES[key] = cls._make_class(name, schema, resource_url)
+        return _RECORD_CLASSES[key]
+
+    @classmethod
+    def _make_class(cls, name, schema, resource_url):
+        fields = tuple(dict.fromkeys(RECORD_META_FIELDS + tuple(schema)))
+        defaults = {k: v["default"] for k, v in schema.items() if "default" in v}
+        decoders = {
+            k: RECORD_DECODERS[v.get("type", "string")]
+            for k, v in schema.items() if v.get("type", "string") in RECORD_DECODERS
+        }
+        media = tuple(k for k, v in schema.items() if v.get("type", "string") == "media")
+        # fields named like a class attribute would replace it with their slot
+        reserved = set(dir(cls))
+        slots = {}
+        for k in fields:
+            slot = k
+            while slot in reserved:
+                slot += "_"
+            reserved.add(slot)
+            slots[k] = slot
+        params = dict(
+            __slots__=tuple(slots.values()),
+            schema=schema,
+            _resource_url=resource_url,
+            _fields=fields,
+            _slots=slots,
+            _defaults=defaults,
+            _decoders=decoders,
+            _media=media,
+        )
+        return type(f"{name}Record", (cls, ), params)
+
+    @property
+    def url(self):
+        return "/".join([self._resource_url, self._id])
+
+    def _get(self, field):
+        return getattr(self, self._slots[field])
+
+    def _set(self, field, value):
+        setattr(self, self._slots[field], value)
+
+    def to_record(self, exclude_files=True):
+        obj = {}
+        for k in self.schema:
+            v = self._get(k)
+            if exclude_files and isinstance(v, (bytes, MediaHandle)):
+                continue
+            obj[k] = v
+        return obj
+
+    def to_dict(self):
+        return self.to_record()
+
+    def to_json(self):
+        return json.dumps(self.to_record(), cls=NumpyJSONENncoder)
+
+    def keys(self):
+        yield from self.to_record().keys()
+
+    def values(self):
+        yield from self.to_record().values()
+
+    def items(self):
+        yield from self.to_record().items()
+
+    def __getitem__(self, key):
+        if key in self.schema:
+            return self._get(key)
+        else:
+            raise KeyError(f"{key} not found.")
+
+    def __setitem__(self, key, value):
+        if key in self.schema:
+            self._set(key, value)
+        else:
+            raise KeyError(f"{key} cannot be set.")
+
+    def _write(self, method, fields):
+        headers = {"Content-Type": "application/json"}
+        if self._etag:
+            headers["If-Match"] = self._etag
+        data = {k: self._get(k) for k in fields}
+        data = {k: v for k, v in data.items() if not isinstance(v, MediaHandle)}
+        doc = {k: v for k, v in data.items() if v is not None}
+        files = {name: BytesIO(doc.pop(name)) for name, value in data.items()
+                    if isinstance(value, bytes)}
+        data = json.dumps(doc, cls=NumpyJSONENncoder)
+        with self.session.Client() as client:
+            resp = client.request(method, self.url, data=data, files=files, headers=headers)
+            resp.raise_for_status()
+        invalidate_results(self._resource_url)
+        result = resp.json()
+        for k in ("_etag", "_version", "_latest_version", "_updated"):
+            if k in result:
+                setattr(self, k, result[k])
+        for k in self._media:
+            v = self._get(k)
+            if isinstance(v, MediaHandle):
+                v.release(etag=self._etag)
+        return result
+
+    def push(self):
+        """Replace the remote document with this record.
+        """
+        return self._write("PUT", [k for k in self.schema if not k.startswith("_")])
+
+    def patch(self, *fields):
+        """Update the given fields of the remote document.
+        """
+        return self._write("PATCH", fields)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(_id={self._id})"
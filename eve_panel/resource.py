@@ -1,27 +1,35 @@
+import collections
 import itertools
 import json
 from io import BytesIO, StringIO
 import time
-import panel as pn
 import param
 import yaml
 import typing
 import math
 import asyncio
-import base64
 from typing import Union, List, Dict, Tuple
 import multiprocessing as mp
-from tqdm.autonotebook import tqdm
 
-from .widgets import Progress
 from .settings import config as settings
 from .eve_model import EveModelBase
-from .field import SUPPORTED_SCHEMA_FIELDS, TYPE_MAPPING, Validator
+from .field import document_validator
 from .session import DEFAULT_SESSION_CLASS, EveSessionBase
 from .item import EveItem
+from .record import EveRecord
 from .page import EvePage, EvePageCache, PageZero
 from .io import FILE_READERS, read_data_file
-from .types import DASK_TYPE_MAPPING, COERCERS
+from .types import COERCERS
+from .arrow_io import arrow_schema, import_pyarrow, to_record_batch
+from .columnar import ColumnBuilder, conform_column, field_schema
+from .export import export_resource
+from .bulk import insert_chunked, upload_with_media
+from .shard import iter_sharded_pages
+from .stream import Stream
+from .decode import check_process_options, iter_decoded_batches
+from .mirror import LocalStore, SQLiteStore, sync_resource
+from .result_cache import ResultCache
+from .media import MediaHandle
 from .utils import NumpyJSONENncoder, to_data_dict
 
 try:
@@ -33,6 +41,16 @@ except ImportError:
 
 from concurrent.futures import ThreadPoolExecutor
 
+RESULT_CACHE_PARAMS = ("where", "projection", "sort", "max_results", "page")
+
+
+def is_count_query(params):
+    """Requests for a single document are counts (or lookups), answered live
+    so totals follow the server.
+    """
+    return int(params.get("max_results") or 25) <= 1
+
+
 def not_empty(v):
     if v is None:
         return False
@@ -50,7 +68,7 @@ class EveResource(EveModelBase):
 
     """
     session = param.ClassSelector(EveSessionBase, constant=True, precedence=-1)
-    _paste_bin = param.ClassSelector(class_=pn.widgets.Ace, default=None, )
+    _paste_bin = param.Parameter(default=None, )
     _url = param.String(precedence=-1)
     _page_view_format = param.Selector(objects=["Table", "Widgets", "JSON"],
                                        default=settings.DEFAULT_VIEW_FORMAT,
@@ -62,9 +80,14 @@ class EveResource(EveModelBase):
 
     _cache = param.ClassSelector(class_=EvePageCache, default=EvePageCache())
     _cache_raw = param.Dict({})
+    mirror = param.ClassSelector(LocalStore, default=None, precedence=-1)
+    _results = param.ClassSelector(ResultCache, default=None, precedence=-1)
     _item_class = param.ClassSelector(EveItem,
                                       is_instance=False,
                                       precedence=-1)
+    _record_class = param.ClassSelector(EveRecord,
+                                      is_instance=False,
+                                      precedence=-1)
     # _upload_buffer = param.List(default=[], precedence=-1)
     _upload_buffer = param.String(default="", precedence=1)
     _file_buffer = param.ClassSelector(bytes)
@@ -91,7 +114,7 @@ class EveResource(EveModelBase):
     _next_page_button = param.Action(lambda self: self.increment_page(),
                                      label="\u23E9",
                                      precedence=3)
-    _clear_cache_button = param.Action(lambda self: self.clear_cache(),
+    _clear_cache_button = param.Action(lambda self: self.clear_results(),
                                      label="\u2672",
                                      precedence=5)
     _plot_selection = param.String("None")
@@ -120,17 +143,18 @@ class EveResource(EveModelBase):
         if session is None:
             session = DEFAULT_SESSION_CLASS()
         
-        item = EveItem.from_schema(resource["item_title"].replace(" ", "_"),
-                                   schema,
-                                   resource["url"],
-                                   session=session)
-        item_class = item.__class__
+        item_class = EveItem.class_from_schema(resource["item_title"].replace(" ", "_"),
+                                               schema,
+                                               resource["url"])
+        record_class = EveRecord.from_schema(item_class.__name__, schema, resource["url"])
         plots = list(resource.get("metadata", {}).get("plots", {}))
         params = dict(name=resource["resource_title"].replace(" ", "_"),
                       _url=resource["url"],
                       session=session,
                       _item_class=item_class,
+                      _record_class=record_class,
                       _resource_def=resource,
+                      _results=ResultCache(url=resource["url"]),
                       schema=schema,
                       fields=list(schema))
         instance = cls(**params)
@@ -141,15 +165,12 @@ class EveResource(EveModelBase):
     def __getitem__(self, key):
         if key in self._cache:
             return self._cache[key]
-        data = self.session.get("/".join([self._url, key]))
+        params = {}
+        if self._file_fields:
+            params["projection"] = json.dumps(self.listing_projection())
+        data = self.session.get("/".join([self._url, key]), **params)
         if data:
-            if self._file_fields:
-                for k in self._file_fields:
-                    try:
-                        data[k] = base64.b64decode(data[k])
-                    except:
-                        pass
-            item = self.make_item(**data)
+            item = self.item_from_server(**data)
             return item
         raise KeyError
 
@@ -167,12 +188,71 @@ class EveResource(EveModelBase):
         """
         return self._item_class(**kwargs, session=self.session)
 
+    def item_from_server(self, **doc):
+        """Generate EveItem from a document returned by the server.
+        The server already validated the document so field validation is skipped,
+        media fields are wrapped in MediaHandles that download their content on access.
+
+        Returns:
+            EveItem: EveItem instance of current resource.
+        """
+        if self._file_fields and doc.get("_id"):
+            url = "/".join([self._url, doc["_id"]])
+            for name in self._file_fields:
+                value = doc.get(name)
+                if value is None or isinstance(value, str):
+                    doc[name] = MediaHandle(self.session, url, name, value=value,
+                                            etag=doc.get("_etag"))
+        return self._item_class.from_server(**doc, session=self.session)
+
+    def listing_projection(self, projection=None):
+        """Projection that leaves out media fields, their content is
+        only downloaded when accessed through a :class:`MediaHandle`.
+        """
+        projection = dict(projection or {})
+        if any(projection.values()):
+            projection = {k: v for k, v in projection.items() if k not in self._file_fields}
+            # an empty projection would return every field, media included
+            return projection if any(projection.values()) else {"_id": 1}
+        return dict(projection, **{name: 0 for name in self._file_fields})
+
+    def make_record(self, **kwargs):
+        """Generate a lightweight EveRecord from key value pairs
+
+        Returns:
+            EveRecord: EveRecord instance with the fields of the current resource schema.
+        """
+        return self._record_class(session=self.session, data=kwargs)
+
+    def make_page(self, docs, page_number=None, lightweight=False):
+        """Wrap documents in an EvePage
+
+        Args:
+            docs (list[dict]): documents returned by the server
+            page_number (int, optional): page number used for naming the page.
+            lightweight (bool, optional): hold EveRecords instead of EveItems. Defaults to False.
+
+        Returns:
+            EvePage: page holding the documents.
+        """
+        make = self.make_record if lightweight else self.item_from_server
+        items = [make(**doc) for doc in docs]
+        if page_number is None:
+            page_number = self.page_number
+        return EvePage(
+            name=f'{self._url.replace("/", ".")} page {page_number}',
+            _items={item._id: item
+                    for item in items},
+            fields=self.fields,
+            schema=self.schema)
+
     @property
     def projection(self):
         return {k: 1 for k in self.fields if k not in settings.META_FIELDS}
     
     @property
     def paste_bin(self):
+        import panel as pn
         if self._paste_bin is None:
             self._paste_bin = pn.widgets.Ace(name="Paste Bin", value=json.dumps(self.schema, indent=4),
                                              language="json", width=int(self.max_width-50))
@@ -189,6 +269,7 @@ class EveResource(EveModelBase):
                         max_results=1,
                         page=1,
                         timeout=15,
+                        use_cache=False,
                         )
         if "_meta" in resp:
             return int(resp["_meta"].get("total", 0))
@@ -199,9 +280,29 @@ class EveResource(EveModelBase):
     def is_tabular(self):
         return not any([v.get('type', 'dict') in ['list', 'dict'] for v in self.schema.values()])
 
+    def page_layout(self):
+        """Number of documents matching the filters and the page size the server
+        actually serves for items_per_page, which it caps at its PAGINATION_LIMIT.
+
+        Returns:
+            tuple: (total, max_results)
+        """
+        resp = self.get(where=self.filters,
+                        projection={"_id": 1},
+                        max_results=self.items_per_page,
+                        page=1,
+                        timeout=15,
+                        use_cache=False,
+                        )
+        if "_meta" not in resp:
+            raise ConnectionError("Unable to connect to server.")
+        meta = resp["_meta"]
+        return int(meta.get("total", 0)), int(meta.get("max_results") or self.items_per_page)
+
     @property
     def page_numbers(self):
-        return list(range(1, math.ceil(self.nitems/self.items_per_page)+1))
+        total, max_results = self.page_layout()
+        return list(range(1, math.ceil(total/max_results)+1))
 
     @property
     def sorting_options(self)->list:
@@ -231,6 +332,7 @@ class EveResource(EveModelBase):
 
     @param.depends("page_number")
     def gui_progress(self):
+        import panel as pn
         if self._progress is None:
             self._progress = pn.indicators.Progress(value=0, active=self._active, align="center")
         npages = 0
@@ -294,16 +396,16 @@ class EveResource(EveModelBase):
     def df(self):
         return self.to_dataframe()
 
-    def keys(self):
-        for page in self.pages():
+    def keys(self, lightweight=False):
+        for page in self.pages(lightweight=lightweight):
             yield from page.keys()
 
-    def values(self):
-        for page in self.pages():
+    def values(self, lightweight=False):
+        for page in self.pages(lightweight=lightweight):
             yield from page.values()
 
-    def items(self):
-        for page in self.pages():
+    def items(self, lightweight=False):
+        for page in self.pages(lightweight=lightweight):
             yield from page.items()
 
     def records(self):
@@ -312,6 +414,7 @@ class EveResource(EveModelBase):
 
     def init_pbar(self, class_):
         if class_ is None:
+            from tqdm.autonotebook import tqdm
             class_ = tqdm
         pbar = class_(total=self.nitems, 
                     desc=f"Fetching {self.name.lower().replace('_', ' ')} documents", 
@@ -319,37 +422,64 @@ class EveResource(EveModelBase):
         pbar.reset()
         return pbar
 
-    def pages_raw(self, start=1, end=None, asynchronous=True, executor=None, pbar=None):
+    def pages_raw(self, start=1, end=None, asynchronous=True, executor=None, pbar=None,
+                  cache_result=True, prefetch=16, shards=None, shard_key="_id"):
+        """Iterate over the raw documents of each page, in page order.
+
+        Args:
+            prefetch (int, optional): maximum number of pages requested ahead of the
+                        page being consumed, bounds the memory used when the
+                        consumer is slower than the server. Defaults to 16.
+            shards (int, optional): split the query into this many key ranges on
+                        shard_key and fetch them in parallel, see
+                        :func:`eve_panel.shard.iter_sharded_pages`. start and end are
+                        ignored. Defaults to None.
+            shard_key (str, optional): indexed field to shard on. Defaults to "_id".
+        """
         pbar = self.init_pbar(pbar)
+        if shards:
+            yield from iter_sharded_pages(self, shards=shards, key=shard_key,
+                                          cache_result=cache_result, pbar=pbar)
+            return
 
         if asynchronous and executor is None:
             executor = ThreadPoolExecutor(max_workers=8)
         
-        futures = []
+        futures = collections.deque()
         for idx in self.page_numbers:
             if idx<start:
                 continue
             if end is not None and idx > end:
                 break
             if asynchronous:
-                future = executor.submit(self.get_page_raw, idx)
+                future = executor.submit(self.get_page_raw, idx, cache_result=cache_result)
                 futures.append(future)
+                if len(futures) < max(prefetch, 1):
+                    continue
+                page = futures.popleft().result()
             else:
-                page = self.get_page_raw(idx)
-                if page:
-                    pbar.update(len(page))
-                    yield page
-                else:
-                    break
+                page = self.get_page_raw(idx, cache_result=cache_result)
+            if page:
+                pbar.update(len(page))
+                yield page
+            elif not asynchronous:
+                break
 
-        for future in futures:
-            page = future.result()
+        while futures:
+            page = futures.popleft().result()
             if page:
                 pbar.update(len(page))
                 yield page
 
-    def pages(self, start=1, end=None, asynchronous=True, executor=None, pbar=None):
-        
+    def pages(self, start=1, end=None, asynchronous=True, executor=None, pbar=None,
+              lightweight=False):
+        if lightweight:
+            for idx, docs in enumerate(self.pages_raw(start=start, end=end,
+                                        asynchronous=asynchronous, executor=executor,
+                                        pbar=pbar), start):
+                yield self.make_page(docs, page_number=idx, lightweight=True)
+            return
+
         pbar = self.init_pbar(pbar)
 
         if asynchronous and executor is None:
@@ -376,7 +506,7 @@ class EveResource(EveModelBase):
             pbar.update(len(page))
             yield page
 
-    async def pages_async(self, start=1, end=None, pbar=tqdm):
+    async def pages_async(self, start=1, end=None, pbar=None):
 
         pbar = self.init_pbar(pbar)
 
@@ -393,9 +523,32 @@ class EveResource(EveModelBase):
             pbar.update(len(page))
             yield page
 
+    def stream(self, start=1, end=None, prefetch=16, shards=None, shard_key="_id", buffer=4,
+               pbar=None):
+        """Lazy pipeline over the documents matching the current filters,
+        fields and sorting, see :class:`eve_panel.stream.Stream`::
+
+            resource.stream().map(fn).filter(fn).batch(1000).insert_into(other)
+
+        Pages are fetched concurrently as in :meth:`pages_raw`, each stage
+        runs in its own thread with buffer chunks queued between stages.
+
+        Returns:
+            Stream: the pipeline source
+        """
+        def source():
+            return self.pages_raw(start=start, end=end, pbar=pbar, cache_result=False,
+                                  prefetch=prefetch, shards=shards, shard_key=shard_key)
+        return Stream(source, buffer=buffer, resource=self)
+
     def new_item(self, data={}):
-        item = self.item_class(**data)
-        self[item._id] = item
+        """Create an item that is inserted on the next push, kept on page 0.
+        """
+        item = self._item_class(session=self.session, **data)
+        if 0 not in self._cache:
+            self._cache[0] = PageZero(fields=self.fields, schema=self.schema)
+        self._cache[0][item._id] = item
+        return item
 
     def to_records(self, start=1, end=None, asynchronous=True, executor=None, pbar=None):
         records = []
@@ -404,75 +557,218 @@ class EveResource(EveModelBase):
             records.extend(page)
         return records
      
-    def to_dataframe(self, start=1, end=None, asynchronous=True, executor=None, pbar=None):
-        import pandas as pd
+    def to_dataframe(self, start=1, end=None, asynchronous=True, executor=None, pbar=None,
+                     shards=None, shard_key="_id", processes=None):
+        """Fetch documents into a pandas dataframe indexed by _id.
+        Columns are built page by page with dtypes derived from the schema.
+        Pass shards to fetch key ranges in parallel, see :meth:`pages_raw`,
+        or processes to decode pages in a process pool, see :meth:`iter_record_batches`.
+        """
+        if processes:
+            check_process_options(shards=shards, executor=executor)
+            table = self.to_arrow(start=start, end=end, pbar=pbar, processes=processes)
+            df = table.to_pandas()
+            # same dtypes as the columns built page by page
+            for name in df.columns:
+                df[name] = conform_column(field_schema(self.schema, name), df[name])
+            return df.set_index("_id")
+        builder = ColumnBuilder(self.schema, [f for f in self.fields if f in self.schema])
+        for page in self.pages_raw(start=start, end=end, asynchronous=asynchronous,
+                                   executor=executor, pbar=pbar, cache_result=False,
+                                   shards=shards, shard_key=shard_key):
+            builder.append(page)
+        return builder.to_dataframe()
 
-        df = pd.DataFrame(self.to_records(start=start, end=end, asynchronous=asynchronous,
-                        executor=executor, pbar=pbar))
-        df = df[[col for col in df.columns if col in self.schema]]
-        if "_id" in df.columns:
-            df = df.set_index("_id")
-        return df
-   
-    def to_dask(self, pages=None, persist=False, progress=True):
-        try:
-            import dask
-
-        except ImportError:
-            raise RuntimeError("Dask is not installed.")
-        if progress:
-            from dask.diagnostics import ProgressBar
-            ProgressBar().register()
-        if pages is None:
-            pages = self.page_numbers
-        columns = [(k, DASK_TYPE_MAPPING[v.get("type", 'string')]) for k,v in self.schema.items() 
-                                    if k in self.fields and not k.startswith("_")]
-        column_types = dict(columns)
-
-        url = self._url
-        client_kwargs = self.session.get_client_kwargs()
-        if client_kwargs["app"] is not None:
-            client_kwargs["app"] = dict(client_kwargs["app"].config)
-
-        def get_data(params):
-            import httpx
-            if client_kwargs["app"] is not None:
-                from eve import Eve
-                client_kwargs["app"] = Eve(settings=client_kwargs["app"])
-            items = []
-            with httpx.Client(**client_kwargs) as client:
-                try:
-                    resp = client.get(url, params=params,)
-                    items = resp.json().get("_items", [])
-                except:
-                    pass
-            data = [{k:column_types[k](v) for k,v in item.items() if k in column_types} for item in items]
-            return data
-        
-        if not self.is_tabular:
-            import dask.bag as db
-            return db.from_sequence([self.get_page_kwargs(i) for i in pages]).map(get_data).flatten()
+    @property
+    def table_fields(self):
+        """Fields exported to tabular formats, _id first.
+        """
+        return list(dict.fromkeys(["_id"] + [f for f in self.fields if f in self.schema]))
 
-        import dask.dataframe as dd
-        import pandas as pd
-        
-        def get_df(params):
-            data = get_data(params)
-            return pd.DataFrame(data, columns=list(column_types))
-        dask_name = str(hash((self.name, )+tuple(self.get_page_kwargs(1).values())))
-        dsk = {(dask_name, i-1): (get_df, self.get_page_kwargs(i)) for i in pages}
-        
-        nitems = self.nitems
-        divisions = list(range(0, nitems, self.items_per_page))
-        if nitems not in divisions:
-           divisions = divisions + [nitems]
-        
-        df = dd.DataFrame(dsk, dask_name, columns, divisions)
-        if persist:
-            return df.persist()
-        return df
+    def arrow_schema(self):
+        """Arrow schema derived from the Eve schema of the selected fields.
+        """
+        return arrow_schema(self.schema, self.table_fields)
+
+    def iter_record_batches(self, start=1, end=None, asynchronous=True, executor=None, pbar=None,
+                            shards=None, shard_key="_id", processes=None):
+        """Fetch documents as arrow RecordBatches, one batch per page.
+
+        Args:
+            processes (int, optional): decode the raw pages in this many worker
+                        processes, fetching, decoding and assembly then overlap
+                        across cores. See :func:`eve_panel.decode.iter_decoded_batches`.
+
+        Yields:
+            pyarrow.RecordBatch: batch with the schema given by :meth:`arrow_schema`
+        """
+        if processes:
+            check_process_options(shards=shards, executor=executor)
+            pbar = self.init_pbar(pbar)
+            yield from iter_decoded_batches(self, processes=processes, start=start, end=end,
+                                            pbar=pbar)
+            return
+        fields = self.table_fields
+        for page in self.pages_raw(start=start, end=end, asynchronous=asynchronous,
+                                   executor=executor, pbar=pbar, cache_result=False,
+                                   shards=shards, shard_key=shard_key):
+            yield to_record_batch(page, self.schema, fields)
+
+    def to_arrow(self, start=1, end=None, asynchronous=True, executor=None, pbar=None,
+                 shards=None, shard_key="_id", processes=None):
+        """Fetch documents into an arrow Table.
+        The table can be handed to pandas, polars or DuckDB without copying.
+        """
+        pa = import_pyarrow()
+        batches = self.iter_record_batches(start=start, end=end, asynchronous=asynchronous,
+                                           executor=executor, pbar=pbar,
+                                           shards=shards, shard_key=shard_key,
+                                           processes=processes)
+        return pa.Table.from_batches(list(batches), schema=self.arrow_schema())
+
+    def to_parquet(self, path, row_group_size=65536, compression="snappy", partition_by=None,
+                   start=1, end=None, asynchronous=True, executor=None, pbar=None,
+                   shards=None, shard_key="_id", processes=None):
+        """Stream the documents matching the current filters, fields and sorting
+        to parquet. Pages are written out as they arrive so memory use
+        is bounded by the row group size, not by the size of the resource.
+
+        Args:
+            path (str): file to write, or dataset directory if partition_by is given
+            row_group_size (int, optional): rows per row group. Defaults to 65536.
+            compression (str, optional): parquet compression codec. Defaults to "snappy".
+            partition_by (Union[str,list], optional): field(s) to partition a hive style
+                        dataset directory by. Defaults to None.
+            shards (int, optional): fetch this many key ranges of shard_key in parallel.
+            processes (int, optional): decode pages in this many worker processes.
+
+        Returns:
+            int: number of rows written
+        """
+        pa = import_pyarrow()
+        import pyarrow.parquet as pq
+
+        schema = self.arrow_schema()
+        batches = self.iter_record_batches(start=start, end=end, asynchronous=asynchronous,
+                                           executor=executor, pbar=pbar,
+                                           shards=shards, shard_key=shard_key,
+                                           processes=processes)
+        nrows = 0
+        if partition_by:
+            import pyarrow.dataset as ds
+
+            def counted(batches):
+                nonlocal nrows
+                for batch in batches:
+                    nrows += batch.num_rows
+                    yield batch
+
+            if isinstance(partition_by, str):
+                partition_by = [partition_by]
+            file_options = ds.ParquetFileFormat().make_write_options(compression=compression)
+            ds.write_dataset(counted(batches), path, schema=schema, format="parquet",
+                             partitioning=partition_by, partitioning_flavor="hive",
+                             file_options=file_options,
+                             max_rows_per_group=row_group_size,
+                             min_rows_per_group=min(row_group_size, 1024),
+                             existing_data_behavior="overwrite_or_ignore")
+            return nrows
+
+        with pq.ParquetWriter(path, schema, compression=compression) as writer:
+            buffered = []
+            nbuffered = 0
+            for batch in batches:
+                buffered.append(batch)
+                nbuffered += batch.num_rows
+                if nbuffered >= row_group_size:
+                    # write whole row groups, the remainder starts the next one
+                    table = pa.Table.from_batches(buffered, schema=schema)
+                    nfull = nbuffered - nbuffered % row_group_size
+                    writer.write_table(table.slice(0, nfull), row_group_size=row_group_size)
+                    nrows += nfull
+                    buffered = table.slice(nfull).to_batches()
+                    nbuffered -= nfull
+            if nbuffered:
+                writer.write_table(pa.Table.from_batches(buffered, schema=schema),
+                                   row_group_size=row_group_size)
+                nrows += nbuffered
+        return nrows
+
+    def export(self, directory, format="parquet", pages_per_file=10, resume=True,
+               asynchronous=True, executor=None, pbar=None):
+        """Export the documents matching the current filters, fields and sorting
+        to part files in directory. A checkpoint is written after every part,
+        rerunning the same export resumes after the last completed part.
+        Set a sorting (e.g. _id) so page contents are stable between runs.
+
+        Args:
+            directory (str): output directory
+            format (str, optional): "parquet" or "jsonl". Defaults to "parquet".
+            pages_per_file (int, optional): pages per part file. Defaults to 10.
+            resume (bool, optional): resume from an existing checkpoint. Defaults to True.
+
+        Returns:
+            list: paths of the part files
+        """
+        return export_resource(self, directory, format=format, pages_per_file=pages_per_file,
+                               resume=resume, asynchronous=asynchronous, executor=executor,
+                               pbar=pbar)
+
+    def sync(self, store, soft_delete=None, max_results=None, timeout=None):
+        """Bring a local copy of this resource up to date.
+        Only documents updated since the previous sync into store are downloaded,
+        using the _updated high-water mark saved in the store.
 
+        Args:
+            store (LocalStore): local store, e.g. eve_panel.mirror.MemoryStore()
+            soft_delete (bool, optional): also fetch soft deleted documents and remove
+                        them from the store. Defaults to the soft_delete setting of the resource.
+            max_results (int, optional): page size. Defaults to items_per_page.
+
+        Returns:
+            dict: upserted and deleted counts and the new high-water mark
+        """
+        return sync_resource(self, store, soft_delete=soft_delete,
+                             max_results=max_results, timeout=timeout)
+
+    def materialize(self, path=None, store=None):
+        """Mirror this resource into an embedded database and use it for
+        queries while the session is offline. Calling it again only
+        downloads the documents changed since the previous call.
+
+        Args:
+            path (str, optional): SQLite database file. Defaults to the file of the
+                        current mirror, or ":memory:" if there is none. A different
+                        path replaces the current mirror with one at path.
+            store (LocalStore, optional): store to use instead of an SQLite table.
+
+        Raises:
+            ValueError: both path and store are given.
+
+        Returns:
+            LocalStore: the mirror
+        """
+        if path is not None and store is not None:
+            raise ValueError("Pass either a database path or a store to materialize, not both.")
+        if store is None:
+            store = self.mirror
+            if path is not None and not (isinstance(store, SQLiteStore) and store.is_at(path)):
+                store = None
+        if store is None:
+            store = SQLiteStore(self.schema, path=path or ":memory:", table=self.name)
+        self.sync(store)
+        self.mirror = store
+        return store
    
+    def to_dask(self, npartitions=8, persist=False, progress=True, pages=None):
+        """Read the documents matching the current filters into a dask
+        DataFrame indexed by _id, with one partition per _id range.
+        pages is deprecated. See :func:`eve_panel.dask_io.to_dask`.
+        """
+        from .dask_io import to_dask
+        return to_dask(self, npartitions=npartitions, persist=persist, progress=progress,
+                       pages=pages)
+
     def pull(self, start=1, end=None):
         for idx in itertools.count(start):
             if end is not None and idx > end:
@@ -481,73 +777,154 @@ class EveResource(EveModelBase):
                 break
     
     def push(self, idxs=None):
+        if self._results is not None:
+            self._results.clear()
         if idxs is None:
             idxs = list(self._cache.keys())
         for idx in idxs:
             self._cache[idx].push()
 
-    def get(self, timeout=None, **params):
+    def query_mirror(self, **params):
+        """Answer a GET from the local mirror, used when the session is offline.
+        """
+        if self.mirror is None:
+            raise ConnectionError(f"Session is offline and {self.name} has no local mirror, "
+                                  "call materialize() while online first.")
+        return self.mirror.query(**params)
+
+    def cached_response(self, use_cache, params):
+        """Response to a GET answered from the result cache, if possible.
+        """
+        if not use_cache or self._results is None or set(params) - set(RESULT_CACHE_PARAMS):
+            return None
+        if is_count_query(params):
+            return None
+        return self._results.answer(**params)
+
+    def cache_response(self, data, cache_result, params):
+        if not cache_result or self._results is None or set(params) - set(RESULT_CACHE_PARAMS):
+            return
+        self._results.store(data, **params)
+
+    def clear_results(self):
+        """Drop all cached query results, including those shared with clones.
+        """
+        if self._results is not None:
+            self._results.clear()
+        self.clear_cache()
+
+    def cache_fills(self, use_cache, params):
+        """GETs that fetch only the parts of a partially cached page that are
+        missing, e.g. after items_per_page changed, or None if the page
+        cannot be completed from the cache.
+        """
+        if not use_cache or self._results is None or set(params) - set(RESULT_CACHE_PARAMS):
+            return None
+        if is_count_query(params):
+            return None
+        plan = self._results.plan(**params)
+        if plan is None:
+            return None
+        projection, requests = plan
+        return [dict(params, projection=projection, page=page, max_results=max_results)
+                for page, max_results in requests]
+
+    def fill_cached_response(self, use_cache, params, timeout=None):
+        """Fetch the missing parts of a partially cached page, then answer from the cache.
+        """
+        fills = self.cache_fills(use_cache, params)
+        if fills is None:
+            return None
+        for fill in fills:
+            self.get(timeout=timeout, **fill)
+        return self._results.answer(**params)
+
+    async def fill_cached_response_async(self, use_cache, params, timeout=None):
+        """Fetch the missing parts of a partially cached page, then answer from the cache.
+        """
+        fills = self.cache_fills(use_cache, params)
+        if fills is None:
+            return None
+        await asyncio.gather(*[self.get_async(timeout=timeout, **fill) for fill in fills])
+        return self._results.answer(**params)
+
+    def get_raw(self, timeout=None, **params):
+        """GET the resource and return the undecoded response body.
+        """
+        if self.session.offline:
+            return json.dumps(self.query_mirror(**params), cls=NumpyJSONENncoder).encode()
+        params = {k:v for k,v in params.items() if not_empty(v)}
+        params = {k:v if isinstance(v, str) else json.dumps(v, cls=NumpyJSONENncoder) for k,v in params.items()}
+        with self.session.Client(timeout=timeout) as client:
+            resp = client.get(self._url, params=params)
+            resp.raise_for_status()
+            return resp.content
+
+    def get(self, timeout=None, cache_result=True, use_cache=True, **params):
+        if self.session.offline:
+            return self.query_mirror(**params)
+        data = self.cached_response(use_cache, params)
+        if data is None:
+            data = self.fill_cached_response(use_cache and cache_result, params, timeout=timeout)
+        if data is not None:
+            return data
         params = {k:v for k,v in params.items() if not_empty(v)}
         params = {k:v if isinstance(v, str) else json.dumps(v, cls=NumpyJSONENncoder) for k,v in params.items()}
         with self.session.Client(timeout=timeout) as client:
             resp = client.get(self._url, params=params)
             data = resp.json()
+        self.cache_response(data, cache_result and use_cache, params)
         return data
 
-    async def get_async(self, timeout=None, **params):
+    async def get_async(self, timeout=None, cache_result=True, use_cache=True, **params):
+        if self.session.offline:
+            return self.query_mirror(**params)
+        data = self.cached_response(use_cache, params)
+        if data is None:
+            data = await self.fill_cached_response_async(use_cache and cache_result, params,
+                                                          timeout=timeout)
+        if data is not None:
+            return data
         params = {k:v for k,v in params.items() if v is not None}
         params = {k:v if isinstance(v, str) else json.dumps(v, cls=NumpyJSONENncoder) for k,v in params.items()}
         async with self.session.AsyncClient(timeout=timeout) as client:
             resp = await client.get(self._url, params=params)
             data = resp.json()
+        self.cache_response(data, cache_result and use_cache, params)
         return data
     
-    def post_with_files(self, docs):
-        success, failed, errors = [], [], []
-        with self.session.Client(headers={"Content-Type": "application/json"}) as client:
-            for doc in docs:
-                files = {name: BytesIO(doc.pop(name)) for name in self._file_fields if name in doc}
-                data = json.dumps(docs, cls=NumpyJSONENncoder)
-               
-                try:
-                    resp = client.post(self._url, data=data, files=files,
-                                 )
-                    success.append(doc)
-                except Exception as e:
-                    failed.append(doc)
-                    errors.append(str(e))
-        
-        return success, failed, errors
-
-    def post_batched(self, docs):
-        data = json.dumps(docs, cls=NumpyJSONENncoder)
-        with self.session.Client(headers={"Content-Type": "application/json"}) as client:
-            resp = client.post(self._url, data=data,)
-        success, failed, errors = [], [], []
-        results = resp.json()
-        if "_items" in results:
-            results = results["_items"]
-        else:
-            results = [results]
+    def post_with_files(self, docs, concurrency=4, retries=2, timeout=None, fields_as_json=False,
+                        **kwargs):
+        """POST documents with media fields, one multipart request per document.
+        Media values can be bytes, file paths or file objects, files are
+        streamed rather than read into memory. See :class:`eve_panel.bulk.MediaUpload`.
 
-        for doc, result in zip(docs, results):
-            if result["_status"]=="OK":
-                success.append(doc)
-            else:
-                failed.append(doc)
-                errors.append(result)
-            
-        if len(failed):
-            success = []
-        return success, failed, errors
+        Returns:
+            tuple[list, list, list]: inserted, rejected, rejection reasons
+        """
+        return upload_with_media(self, docs, concurrency=concurrency, retries=retries,
+                                 timeout=timeout, fields_as_json=fields_as_json)
+
+    def post_batched(self, docs, chunk_size=None, max_bytes=None, concurrency=4, retries=2,
+                     timeout=None):
+        """POST documents in chunks, see :class:`eve_panel.bulk.BulkInsert`.
 
-    def post(self, docs, raise_status=True):
+        Returns:
+            tuple[list, list, list]: inserted, rejected, rejection reasons
+        """
+        return insert_chunked(self, docs, chunk_size=chunk_size, max_bytes=max_bytes,
+                              concurrency=concurrency, retries=retries, timeout=timeout)
+
+    def post(self, docs, raise_status=True, **kwargs):
+        if self._results is not None:
+            self._results.clear()
         if len(self._file_fields):
-            return self.post_with_files(docs)
+            return self.post_with_files(docs, **kwargs)
         else:
-            return self.post_batched(docs)
+            return self.post_batched(docs, **kwargs)
 
-    def find(self, query={}, projection={}, sort="", max_results=25, page_number=1, timeout=None):
+    def find(self, query={}, projection={}, sort="", max_results=25, page_number=1, timeout=None,
+             cache_result=True):
         """Find documents in the remote resource that match a mongodb query.
 
         Args:
@@ -558,19 +935,21 @@ class EveResource(EveModelBase):
             max_results (int, optional): Items per page. Defaults to 25.
             page_number (int, optional): page to return if query returns more than max_results.\
                                          Defaults to 1.
+            cache_result (bool, optional): keep the documents in the result cache. Defaults to True.
 
         Returns:
-            list: requested page documents that match query
+            list: requested page documents that match query, without media fields.
+                  Items made from them access media through a :class:`MediaHandle`.
         """
-        if max_results>1 and not any([bool(v) for v in projection.values()]):
-            for name in self._file_fields:
-                projection[name] = 0
+        if self._file_fields:
+            projection = self.listing_projection(projection)
         resp = self.get(where=query,
                         projection=projection,
                         sort=sort,
                         max_results=max_results,
                         page=page_number,
-                        timeout=timeout)
+                        timeout=timeout,
+                        cache_result=cache_result)
         if "_error" in resp:
             return resp["_error"]
 
@@ -578,16 +957,10 @@ class EveResource(EveModelBase):
         if "_items" in resp:
             docs = resp["_items"]
 
-        if self._file_fields:
-            for doc in docs:
-                for k in self._file_fields:
-                    try:
-                        doc[k] = base64.b64decode(doc[k])
-                    except:
-                        pass
         return docs
 
-    async def find_async(self, query={}, projection={}, sort="", max_results=25, page_number=1, timeout=None):
+    async def find_async(self, query={}, projection={}, sort="", max_results=25, page_number=1,
+                         timeout=None, cache_result=True):
         """Find documents in the remote resource that match a mongodb query.
 
         Args:
@@ -602,53 +975,32 @@ class EveResource(EveModelBase):
         Returns:
             list: requested page documents that match query
         """
-        if max_results>1 and not any([bool(v) for v in projection.values()]):
-            for name in self._file_fields:
-                projection[name] = 0
+        if self._file_fields:
+            projection = self.listing_projection(projection)
         resp = await self.get_async(where=query,
                         projection=projection,
                         sort=sort,
                         max_results=max_results,
                         page=page_number,
-                        timeout=timeout)
+                        timeout=timeout,
+                        cache_result=cache_result)
         docs = []
         if "_items" in resp:
             docs = resp["_items"]
 
-        if self._file_fields:
-            for doc in docs:
-                for k in self._file_fields:
-                    try:
-                        doc[k] = base64.b64decode(doc[k])
-                    except:
-                        pass
         return docs
 
     def find_page(self, **kwargs):
         """Same as :meth:`eve_panel.EveResource.find()`, only returns an EvePage instance
         """
         docs = self.find(**kwargs)
-        items = [self.make_item(**doc) for doc in docs]
-        page_number = kwargs.get("page_number", self.page_number)
-        page = EvePage(
-            name=f'{self._url.replace("/", ".")} page {page_number}',
-            _items={item._id: item
-                    for item in items},
-            fields=self.fields)
-        return page
+        return self.make_page(docs, kwargs.get("page_number"))
 
     async def find_page_async(self, **kwargs):
         """Same as :meth:`eve_panel.EveResource.find()`, only returns an EvePage instance
         """
         docs = await self.find_async(**kwargs)
-        items = [self.make_item(**doc) for doc in docs]
-        page_number = kwargs.get("page_number", self.page_number)
-        page = EvePage(
-            name=f'{self._url.replace("/", ".")} page {page_number}',
-            _items={item._id: item
-                    for item in items},
-            fields=self.fields)
-        return page
+        return self.make_page(docs, kwargs.get("page_number"))
 
     def find_df(self, **kwargs):
         """Same as :meth:`eve_panel.EveResource.find()`, only returns a pandas dataframe
@@ -703,12 +1055,12 @@ class EveResource(EveModelBase):
     def find_one_item(self, **kwargs):
         doc = self.find_one(**kwargs)
         if doc:
-            return self.make_item(**doc)
+            return self.item_from_server(**doc)
 
     async def find_one_item_async(self, **kwargs):
         doc = await self.find_one_async(**kwargs)
         if doc:
-            return self.make_item(**doc)
+            return self.item_from_server(**doc)
 
     def validate_documents(self, docs: List[Dict], coerce=True) -> Tuple:
         """Validates documents against resource schema
@@ -719,39 +1071,37 @@ class EveResource(EveModelBase):
         Returns:
             tuple[list,list,list]: tuple of documents lists: (valid, rejected, errors) 
         """
-        schema = {
-            name:
-            {k: v
-             for k, v in field.items() if k in SUPPORTED_SCHEMA_FIELDS}
-            for name, field in self.schema.items()
-        }
-        for name, sch in schema.items():
-            if sch["type"] in TYPE_MAPPING:
-                sch["type"] = TYPE_MAPPING[sch["type"]]
-        if coerce:
-            for sch in schema.values():
-                if sch["type"] in COERCERS:
-                    sch["coerce"] = COERCERS[sch["type"]]
-        v = Validator(schema)
+        v = document_validator(self.schema, coerce=coerce)
         valid = []
         rejected = []
         errors = []
         for doc in docs:
-            if v.validate(doc):
-                valid.append(v.document)
+            # paths and file objects of media fields are streamed on upload,
+            # validate a placeholder instead
+            streamed = {k: doc[k] for k in self._file_fields
+                        if doc.get(k) is not None and not isinstance(doc[k], bytes)}
+            if v.validate(dict(doc, **{k: b"" for k in streamed})):
+                valid.append(dict(v.document, **streamed))
             else:
                 rejected.append(doc)
                 errors.append(v.errors)
         return valid, rejected, errors
 
 
-    def insert_documents(self, docs: Union[List, Tuple, Dict], validate=True, dry=False) -> Tuple:
-        """Insert documents into the database
+    def insert_documents(self, docs: Union[List, Tuple, Dict], validate=True, dry=False,
+                         chunk_size=None, max_bytes=None, concurrency=4, retries=2) -> Tuple:
+        """Insert documents into the database.
+        Documents are sent in chunks, concurrently. Each document is reported
+        as inserted or rejected, a failing chunk does not affect the others.
 
         Args:
             docs (list): Documents to insert.
             validate (bool, optional): whether to validate schema of docs locally. Defaults to True.
             dry (bool, optional): Enable dry run, will validate but not insert documents into DB. Defaults to False.
+            chunk_size (int, optional): documents per request. Defaults to settings.BULK_CHUNK_SIZE.
+            max_bytes (int, optional): encoded JSON bytes per request. Defaults to settings.BULK_MAX_BYTES.
+            concurrency (int, optional): requests in flight. Defaults to 4.
+            retries (int, optional): retries of a chunk after a connection failure, 429 or 503. Defaults to 2.
 
         Raises:
             TypeError: raised if docs is not the correct type.
@@ -772,7 +1122,10 @@ class EveResource(EveModelBase):
         if dry:
             success = docs
         elif docs:
-            success, post_rejected, post_errors = self.post(docs)
+            success, post_rejected, post_errors = self.post(docs, chunk_size=chunk_size,
+                                                            max_bytes=max_bytes,
+                                                            concurrency=concurrency,
+                                                            retries=retries)
             rejected.extend(post_rejected)
             errors.extend(post_errors)
         else:
@@ -822,7 +1175,8 @@ class EveResource(EveModelBase):
                         sort=",".join(self.sorting),
                         max_results=self.items_per_page,
                         page_number=idx,
-                        timeout=timeout)
+                        timeout=timeout,
+                        cache_result=cache_result)
         if page and cache_result:
             self._cache_raw[idx] = page
         return page
@@ -871,11 +1225,10 @@ class EveResource(EveModelBase):
             return
         self._cache[idx].push()
 
-    def get_page_raw(self, idx, pbar=None):
-        if idx not in self._cache or not len(self._cache[idx]):
-            self.pull_page_raw(idx)
-        page = self._cache_raw.get(
-            idx, [])
+    def get_page_raw(self, idx, pbar=None, cache_result=True):
+        page = self._cache_raw.get(idx)
+        if not page:
+            page = self.pull_page_raw(idx, cache_result=cache_result) or []
         if pbar is not None:
             pbar.update(len(page))
         return page
@@ -943,11 +1296,14 @@ class EveResource(EveModelBase):
                    watch=True)
     def clear_cache(self):
         self._cache = EvePageCache()
+        self._cache_raw = {}
         self._plot = None
 
     def reload_page(self, page_number=None):
         if page_number is None:
             page_number = self.page_number
+        if self._results is not None:
+            self._results.clear()
         if page_number in self._cache:
             self._cache.pop(page_number)
         self.pull_page(page_number)
@@ -962,6 +1318,8 @@ class EveResource(EveModelBase):
         Returns:
             bool: Whether item was removed succesfully.
         """
+        if self._results is not None:
+            self._results.clear()
         return self[_id].delete()
     
     def remove_items(self, *ids):
@@ -1081,6 +1439,7 @@ class EveResource(EveModelBase):
 
     @param.depends("_url")
     def upload_view(self):
+        import panel as pn
         clear_button = pn.widgets.Button(name="Clear buffer",
                                          button_type="warning",
                                          width_policy='max',
@@ -1138,6 +1497,7 @@ class EveResource(EveModelBase):
 
     @param.depends("page_number", "_cache", "_page_view_format")
     def current_page_view(self):
+        import panel as pn
         page = self.get_page(self.page_number)
         if page is None:
             return pn.panel(f"## No data for page {self.page_number}.")
@@ -1146,6 +1506,7 @@ class EveResource(EveModelBase):
 
     @param.depends("upload_errors")
     def upload_errors_view(self):
+        import panel as pn
         alerts = [
             pn.pane.Alert(err, alert_type="danger",
             margin=2,
@@ -1165,6 +1526,7 @@ class EveResource(EveModelBase):
 
     @param.depends("current_page")
     def download_view(self):
+        import panel as pn
         # data_selection = pn.widgets.RadioBoxGroup(options=["Current Page", "Range"])
         # page_range = pn.widgets.IntRangeSlider()
         page_num_select = pn.widgets.IntInput(name="Page", value=self.page_number, step=1, start=1, end=int(1e6))
@@ -1176,6 +1538,7 @@ class EveResource(EveModelBase):
 
     @param.depends("_plot_selection")
     def selected_plot_view(self):
+        import panel as pn
         if self._plot_selection in self.plots:
             plot = getattr(self.plot, self._plot_selection)()
             return pn.panel(plot)
@@ -1183,6 +1546,7 @@ class EveResource(EveModelBase):
             return pn.Column("# No plot selected.")
 
     def make_panel(self, show_client=True, tabs_location='above'):
+        import panel as pn
         plot_selector = pn.Param(self.param._plot_selection,
         widgets={"_plot_selection":{"type": pn.widgets.Select,
                                     "options": ["None"]+self.plots}},
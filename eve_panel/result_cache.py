@@ -0,0 +1,297 @@
+"""
+Result cache
+============
+Cache of query results shared by a resource and its clones.
+Cached ranges of a query, narrower projections, refinements
+and re-sorts of a fully cached query are answered locally.
+"""
+
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from .exceptions import UnsupportedQuery
+from .query import (covers, implies, load_param, match, project, query_fields, query_key,
+                    sort_documents, sort_keys)
+from .settings import config as settings
+
+
+MAX_FILL_REQUESTS = 4
+
+_CACHES = weakref.WeakSet()
+
+
+def invalidate(url):
+    """Drop the cached results of every resource at url, called after
+    writes made outside the resource, e.g. through an item.
+    """
+    for cache in list(_CACHES):
+        if cache.url is None or cache.url == url:
+            cache.clear()
+
+
+def projection_key(projection):
+    return query_key(projection or {})
+
+
+def missing_runs(records, start, stop):
+    """Contiguous [a, b) ranges of offsets between start and stop that are not stored.
+    """
+    runs = []
+    a = None
+    for i in range(start, stop):
+        if i in records:
+            if a is not None:
+                runs.append((a, i))
+                a = None
+        elif a is None:
+            a = i
+    if a is not None:
+        runs.append((a, stop))
+    return runs
+
+
+def aligned_pages(a, b):
+    """Eve pages (page, max_results) that fetch offsets [a, b).
+    Exact pages of size gcd(a, b) are used when few are needed,
+    otherwise the smallest single page containing the range.
+    """
+    size = math.gcd(a, b)
+    if (b - a) // size <= MAX_FILL_REQUESTS:
+        return [(p + 1, size) for p in range(a // size, b // size)]
+    for size in range(b - a, 2 * (b - a) + 1):
+        if a // size == (b - 1) // size:
+            return [(a // size + 1, size)]
+    return None
+
+
+class ResultSet:
+    """Documents returned for one query, stored by their offset
+    in the full result.
+    """
+
+    def __init__(self, where, sort, projection):
+        self.where = where
+        self.sort = sort
+        self.projection = projection
+        self.total = None
+        self.records = {}
+        self.fetched = time.monotonic()
+
+    def expired(self, max_age):
+        return max_age is not None and time.monotonic() - self.fetched > max_age
+
+    @property
+    def complete(self):
+        # an empty result says nothing about documents added since
+        if not self.total or len(self.records) < self.total:
+            return False
+        return all(i in self.records for i in range(self.total))
+
+    def add(self, offset, docs, total=None):
+        if total is not None:
+            self.total = total
+        self.fetched = time.monotonic()
+        for i, doc in enumerate(docs):
+            self.records[offset + i] = dict(doc)
+
+    def documents(self):
+        return [self.records[i] for i in range(self.total)]
+
+    def covers(self, projection):
+        """Whether the stored documents hold every field of the projection.
+        """
+        return covers(self.projection, projection)
+
+    def has_fields(self, fields):
+        """Whether the stored documents contain the given fields.
+        """
+        return covers(self.projection, {f: 1 for f in fields})
+
+    def window(self, offset, size):
+        """Stored documents in [offset, offset+size) of the result, None if any are missing.
+        """
+        if not self.total:
+            return None
+        stop = min(offset + size, self.total)
+        if not all(i in self.records for i in range(offset, stop)):
+            return None
+        return [self.records[i] for i in range(offset, stop)]
+
+
+class ResultCache:
+    """Query results keyed by where, sort and projection.
+
+    Args:
+        max_records (int, optional): number of documents kept before the oldest
+                        results are dropped. Defaults to settings.RESULT_CACHE_MAX_RECORDS.
+        max_age (float, optional): seconds a result is served from the cache.
+                        Defaults to settings.RESULT_CACHE_MAX_AGE.
+        url (str, optional): url of the resource, item writes to it clear the cache.
+    """
+
+    def __init__(self, max_records=None, max_age=None, url=None):
+        self.max_records = max_records or settings.RESULT_CACHE_MAX_RECORDS
+        self.max_age = max_age if max_age is not None else settings.RESULT_CACHE_MAX_AGE
+        self.url = url
+        self.entries = OrderedDict()
+        self._lock = threading.RLock()
+        _CACHES.add(self)
+
+    def __copy__(self):
+        # clones of a resource share the results fetched by each other
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return sum(len(entry.records) for entry in self.entries.values())
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    @staticmethod
+    def parse(where=None, projection=None, sort=None, max_results=25, page=1):
+        return (load_param(where, {}), load_param(projection, {}), sort_keys(sort),
+                int(max_results or 25), int(page or 1))
+
+    @staticmethod
+    def cacheable(where, projection):
+        """Only Mongo style queries are cached, python syntax where strings
+        are left to the server.
+        """
+        return isinstance(where, dict) and isinstance(projection, dict)
+
+    def store(self, response, where=None, projection=None, sort=None, max_results=25, page=1,
+              **kwargs):
+        """Record a server response to a resource GET.
+        """
+        if "_items" not in response:
+            return
+        where, projection, sort, max_results, page = self.parse(where, projection, sort,
+                                                                max_results, page)
+        if not self.cacheable(where, projection):
+            return
+        meta = response.get("_meta", {})
+        total = meta.get("total")
+        # the server may cap max_results, offsets follow the page size it used
+        max_results = int(meta.get("max_results") or max_results)
+        key = (query_key(where), tuple(sort), projection_key(projection))
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                entry = ResultSet(where, sort, projection)
+            entry.add((page - 1) * max_results, response["_items"], total)
+            self.entries[key] = entry
+            self.evict()
+
+    def evict(self):
+        for key in [k for k, entry in self.entries.items() if entry.expired(self.max_age)]:
+            del self.entries[key]
+        while len(self.entries) > 1 and len(self) > self.max_records:
+            self.entries.popitem(last=False)
+
+    def answer(self, where=None, projection=None, sort=None, max_results=25, page=1, **kwargs):
+        """Answer a resource GET from cached results.
+
+        Returns:
+            dict: Eve shaped response or None if the cache cannot answer the request.
+        """
+        where, projection, sort, max_results, page = self.parse(where, projection, sort,
+                                                                max_results, page)
+        if not self.cacheable(where, projection):
+            return None
+        offset = (page - 1) * max_results
+        with self._lock:
+            self.evict()
+            for entry in reversed(self.entries.values()):
+                if not entry.covers(projection):
+                    continue
+                total = None
+                if query_key(entry.where) == query_key(where) and entry.sort == sort:
+                    docs = entry.window(offset, max_results)
+                    total = entry.total
+                else:
+                    docs = self.refine(entry, where, sort)
+                    if docs is not None:
+                        total = len(docs)
+                        self.add_derived(entry, where, sort, docs)
+                        docs = docs[offset:offset + max_results]
+                if docs is None:
+                    continue
+                return {
+                    "_items": [dict(project(doc, projection)) for doc in docs],
+                    "_meta": {"total": total, "page": page, "max_results": max_results},
+                }
+        return None
+
+    def plan(self, where=None, projection=None, sort=None, max_results=25, page=1, **kwargs):
+        """Requests that complete a partially cached page of a query.
+
+        Returns:
+            tuple: projection to fetch with and list of (page, max_results),
+                    or None if the page should be fetched as requested.
+        """
+        where, projection, sort, max_results, page = self.parse(where, projection, sort,
+                                                                max_results, page)
+        if not self.cacheable(where, projection):
+            return None
+        offset = (page - 1) * max_results
+        with self._lock:
+            self.evict()
+            for entry in reversed(self.entries.values()):
+                if not entry.total or entry.sort != sort or not entry.covers(projection):
+                    continue
+                if query_key(entry.where) != query_key(where):
+                    continue
+                stop = min(offset + max_results, entry.total)
+                runs = missing_runs(entry.records, offset, stop)
+                if not runs or sum(b - a for a, b in runs) >= stop - offset:
+                    continue
+                requests = []
+                for a, b in runs:
+                    pages = aligned_pages(a, b)
+                    if pages is None:
+                        return None
+                    requests.extend(pages)
+                if len(requests) > MAX_FILL_REQUESTS:
+                    return None
+                return entry.projection, requests
+        return None
+
+    def refine(self, entry, where, sort):
+        """Documents matching where in the given order, taken from a
+        complete cached superset.
+        """
+        if not entry.complete or not implies(where, entry.where):
+            return None
+        if not entry.has_fields(query_fields(where) | {name for name, _ in sort}):
+            return None
+        docs = entry.documents()
+        if query_key(where) != query_key(entry.where):
+            try:
+                docs = [doc for doc in docs if match(doc, where)]
+            except UnsupportedQuery:
+                return None
+        if sort != entry.sort:
+            docs = sort_documents(docs, sort)
+        return docs
+
+    def add_derived(self, entry, where, sort, docs):
+        """Keep a locally computed result so the following pages
+        are sliced from it instead of being filtered and sorted again.
+        """
+        key = (query_key(where), tuple(sort), projection_key(entry.projection))
+        if key in self.entries:
+            return
+        derived = ResultSet(where, sort, entry.projection)
+        derived.total = len(docs)
+        derived.records = dict(enumerate(docs))
+        # expires with the result it was computed from
+        derived.fetched = entry.fetched
+        self.entries[key] = derived
+        self.evict()
@@ -1,4 +1,3 @@
-import panel as pn
 import param
 from .eve_model import EveModelBase
 
@@ -5,7 +5,6 @@ import time
 import secrets
 from contextlib import contextmanager, asynccontextmanager
 import json
-import panel as pn
 
 from .eve_model import EveModelBase
 from .settings import config as settings
@@ -33,6 +32,8 @@ class EveSessionBase(EveModelBase):
 
     server_url = param.Selector(objects={"localhost": "http://localhost"})
 
+    offline = param.Boolean(False, doc="Answer resource queries from their local mirrors")
+
     """Base class for Eve authentication scheme
 
     Inheritance:
@@ -135,9 +136,11 @@ class EveSessionBase(EveModelBase):
 
     @param.depends("auth_scheme")
     def credentials_view(self):
+        import panel as pn
         return pn.Column(self.auth.credentials_view)
     
     def make_panel(self):
+        import panel as pn
         log = pn.Param(self.param.log, 
             widgets={"log": {"type": pn.widgets.TextAreaInput, "disabled": True, "height": 150}},
             sizing_mode="stretch_both")
@@ -149,6 +152,7 @@ class EveSessionBase(EveModelBase):
                         self.credentials_view, log)
 
     def auth_view(self):
+        import panel as pn
         return pn.Row()
     
     def log_error(self, msg):
@@ -52,6 +52,11 @@ class Config(param.Parameterized):
     SHOW_INDICATOR = True
     DEFAULT_TIMEOUT = 20
     IGNORE_ERRORS = False
+    RESULT_CACHE_MAX_RECORDS = ConfigParameter(int, env_prefix="eve_panel", default=1_000_000)
+    RESULT_CACHE_MAX_AGE = ConfigParameter(float, env_prefix="eve_panel", default=60.0)
+    BULK_CHUNK_SIZE = ConfigParameter(int, env_prefix="eve_panel", default=1000)
+    BULK_MAX_BYTES = ConfigParameter(int, env_prefix="eve_panel", default=4 * 1024 * 1024)
+    MEDIA_CACHE_MAX_BYTES = ConfigParameter(int, env_prefix="eve_panel", default=256 * 1024 * 1024)
     
     OAUTH_DOMAIN = ConfigParameter(str, env_prefix="eve_panel", default="http://localhost/oauth")
     OAUTH_CERT_PATH = ConfigParameter(str, env_prefix="eve_panel", default="/.well-know/certs")
@@ -59,6 +64,8 @@ class Config(param.Parameterized):
     OAUTH_TOKEN_PATH = ConfigParameter(str, env_prefix="eve_panel", default="/token")
     DEFAULT_CLIENT_ID = ConfigParameter(str, env_prefix="eve_panel", default="eve-panel")
     DEFAULT_AUDIENCE = ConfigParameter(str, env_prefix="eve_panel", default="")
+    CACHE_DIR = ConfigParameter(str, env_prefix="eve_panel",
+                                default=os.path.join(os.path.expanduser("~"), ".cache", "eve_panel"))
     
 
 config = Config()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Shard
+=====
+Parallel fetching of a query split into disjoint key ranges.
+"""
+
+import heapq
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .query import sort_key, sort_keys
+from .utils import has_next_page
+
+
+def count(resource, query):
+    resp = resource.get(where=query, projection={"_id": 1}, max_results=1, page=1,
+                        use_cache=False)
+    if "_meta" not in resp:
+        raise ConnectionError(f"Unable to count documents of {resource.name}.")
+    return int(resp["_meta"].get("total", 0))
+
+
+def sample_boundaries(resource, key, shards, query=None):
+    """Values of key splitting the documents matching query into shards of
+    roughly equal size, sampled with one document pages sorted by key.
+
+    Returns:
+        list: sorted, distinct boundary values, at most shards-1 of them
+    """
+    query = dict(resource.filters if query is None else query)
+    ranged = and_query(query, {key: {"$ne": None}})
+    total = count(resource, ranged)
+    boundaries = []
+    for i in range(1, shards):
+        offset = i * total // shards
+        if not 0 < offset < total:
+            continue
+        resp = resource.get(where=ranged, projection={key: 1}, sort=key,
+                            max_results=1, page=offset + 1, cache_result=False)
+        items = resp.get("_items", [])
+        if items and items[0].get(key) is not None:
+            value = items[0][key]
+            if not boundaries or value != boundaries[-1]:
+                boundaries.append(value)
+    return boundaries
+
+
+def and_query(query, condition):
+    if not query:
+        return dict(condition)
+    return {"$and": [query, condition]}
+
+
+def shard_queries(query, key, boundaries, include_missing=True):
+    """Disjoint sub-queries covering query, split at boundaries on key, in key order.
+    Documents without a value for key get their own shard, first since
+    Mongo sorts missing values before all others.
+    """
+    edges = [None] + list(boundaries) + [None]
+    queries = []
+    if include_missing and key != "_id":
+        queries.append(and_query(query, {key: None}))
+    for lower, upper in zip(edges[:-1], edges[1:]):
+        condition = {}
+        if lower is not None:
+            condition["$gte"] = lower
+        if upper is not None:
+            condition["$lt"] = upper
+        if not condition:
+            condition["$ne"] = None
+        queries.append(and_query(query, {key: condition}))
+    return queries
+
+
+class SortedDoc:
+    """Wraps a document for heapq.merge with a multi-key Mongo sort.
+    """
+    __slots__ = ("doc", "keys")
+
+    def __init__(self, doc, sort):
+        self.doc = doc
+        self.keys = [(sort_key(doc, path, direction), direction) for path, direction in sort]
+
+    def __lt__(self, other):
+        for (a, direction), (b, _) in zip(self.keys, other.keys):
+            if a != b:
+                return a < b if direction > 0 else a > b
+        return False
+
+
+def iter_shard(resource, query, sort, max_results, cache_result=True):
+    """Documents of one shard, page by page. The server may cap the page
+    size, later pages are requested with the page size it reports and paging
+    follows its next link or total.
+    """
+    projection = resource.projection
+    if resource._file_fields:
+        projection = resource.listing_projection(projection)
+    page = 1
+    while True:
+        resp = resource.get(where=query, projection=projection, sort=sort,
+                            max_results=max_results, page=page, cache_result=cache_result)
+        if "_error" in resp:
+            raise ConnectionError(f"Fetching a shard of {resource.name} failed: "
+                                  f"{resp['_error']}")
+        yield resp.get("_items", [])
+        if not has_next_page(resp, page):
+            break
+        max_results = int((resp.get("_meta") or {}).get("max_results") or max_results)
+        page += 1
+
+
+def iter_sharded_pages(resource, shards=8, key="_id", max_results=None, cache_result=True,
+                       pbar=None, buffer=4):
+    """Fetch the documents matching the resource filters as independent key range
+    shards, in parallel, and yield pages of max_results documents.
+
+    Without a resource sorting the documents come out ordered by key,
+    otherwise the shards are merged in the order of the resource sorting.
+
+    Args:
+        resource (EveResource): resource to fetch
+        shards (int, optional): number of key ranges. Defaults to 8.
+        key (str, optional): indexed field to split on, e.g. _id, a date or
+                        numeric field. Defaults to "_id".
+        max_results (int, optional): page size. Defaults to items_per_page.
+        buffer (int, optional): pages each shard fetches ahead. Defaults to 4.
+
+    Yields:
+        list: pages of documents
+    """
+    max_results = max_results or resource.items_per_page
+    query = dict(resource.filters)
+    boundaries = sample_boundaries(resource, key, shards, query)
+    queries = shard_queries(query, key, boundaries)
+    sorting = sort_keys(",".join(resource.sorting))
+    ordered_by_key = not sorting or sorting[0] == (key, 1)
+    sort = ",".join(resource.sorting) if sorting else key
+    if ordered_by_key and key != "_id" and (not sorting or len(sorting) == 1):
+        sort = f"{key},_id"
+
+    done = object()
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=max(buffer, 1)) for _ in queries]
+
+    def put(out, item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch(q, out):
+        try:
+            for docs in iter_shard(resource, q, sort, max_results, cache_result=cache_result):
+                if not put(out, docs):
+                    return
+        except BaseException as e:
+            put(out, e)
+        finally:
+            put(out, done)
+
+    def drain(out):
+        while True:
+            item = out.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            if pbar is not None:
+                pbar.update(len(item))
+            yield item
+
+    executor = ThreadPoolExecutor(max_workers=len(queries))
+    try:
+        for q, out in zip(queries, queues):
+            executor.submit(fetch, q, out)
+        if ordered_by_key:
+            # shards are disjoint and already in key order
+            streams = (doc for out in queues for docs in drain(out) for doc in docs)
+        else:
+            merged = heapq.merge(*[(SortedDoc(doc, sorting) for docs in drain(out) for doc in docs)
+                                   for out in queues])
+            streams = (wrapped.doc for wrapped in merged)
+        page = []
+        for doc in streams:
+            page.append(doc)
+            if len(page) >= max_results:
+                yield page
+                page = []
+        if page:
+            yield page
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
@@ -0,0 +1,295 @@
+"""
+Stream
+======
+Lazy, composable pipelines over the documents of a resource, e.g.::
+
+    resource.stream().map(clean).filter(is_valid).batch(1000).to_parquet("out.parquet")
+
+Every stage runs in its own thread and hands chunks of elements to the
+next one through a bounded queue, so fetching, transforming and writing
+overlap while memory stays constant regardless of the resource size.
+"""
+
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import NumpyJSONENncoder
+
+_DONE = object()
+
+
+class StageError:
+    """Exception raised in a stage, forwarded downstream."""
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def map_stage(fn, workers=1):
+    def stage(chunks):
+        if workers <= 1:
+            for chunk in chunks:
+                yield [fn(x) for x in chunk]
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk in chunks:
+                yield list(executor.map(fn, chunk))
+    return stage
+
+
+def filter_stage(fn):
+    def stage(chunks):
+        for chunk in chunks:
+            kept = [x for x in chunk if fn(x)]
+            if kept:
+                yield kept
+    return stage
+
+
+def batch_stage(size):
+    def stage(chunks):
+        batch = []
+        for chunk in chunks:
+            for x in chunk:
+                batch.append(x)
+                if len(batch) >= size:
+                    yield [batch]
+                    batch = []
+        if batch:
+            yield [batch]
+    return stage
+
+
+def flatten_stage():
+    def stage(chunks):
+        for chunk in chunks:
+            yield [x for batch in chunk for x in batch]
+    return stage
+
+
+def documents(elements):
+    """Documents of a stream whose elements are documents or batches of documents."""
+    for x in elements:
+        if isinstance(x, dict):
+            yield x
+        else:
+            yield from x
+
+
+class Stream:
+    """Lazy pipeline over chunks of elements produced by source.
+    Stages are only run when the stream is iterated or written to a sink.
+    Streams are immutable, each method returns a new stream.
+
+    Args:
+        source (callable): returns an iterable of chunks (lists) of elements,
+                    e.g. the pages of a resource
+        stages (list, optional): chunk transforms applied in order
+        buffer (int, optional): chunks held between two stages. Defaults to 4.
+        resource (EveResource, optional): resource the documents come from,
+                    provides the schema for tabular sinks
+    """
+
+    def __init__(self, source, stages=(), buffer=4, resource=None):
+        self.source = source
+        self.stages = list(stages)
+        self.buffer = buffer
+        self.resource = resource
+
+    def pipe(self, stage):
+        """New stream with stage appended, stage maps an iterator of chunks
+        to an iterator of chunks.
+        """
+        return Stream(self.source, self.stages + [stage], buffer=self.buffer,
+                      resource=self.resource)
+
+    def map(self, fn, workers=1):
+        """Apply fn to every element, order is preserved.
+
+        Args:
+            fn (callable): element transform
+            workers (int, optional): threads calling fn concurrently. Defaults to 1.
+        """
+        return self.pipe(map_stage(fn, workers=workers))
+
+    def filter(self, fn):
+        """Keep the elements for which fn returns True."""
+        return self.pipe(filter_stage(fn))
+
+    def batch(self, size):
+        """Group elements into lists of size elements, the last one may be shorter."""
+        return self.pipe(batch_stage(size))
+
+    def flatten(self):
+        """Undo batch, elements of each list become elements of the stream."""
+        return self.pipe(flatten_stage())
+
+    def iter_chunks(self):
+        """Run the pipeline, yielding the chunks coming out of the last stage.
+        """
+        stop = threading.Event()
+
+        def put(out, item):
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def drain(inp):
+            while True:
+                try:
+                    item = inp.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    return
+                if isinstance(item, StageError):
+                    raise item.error
+                yield item
+
+        def run(chunks, out):
+            try:
+                for chunk in chunks:
+                    if not put(out, chunk):
+                        return
+            except BaseException as e:
+                put(out, StageError(e))
+            finally:
+                put(out, _DONE)
+
+        queues = [queue.Queue(maxsize=max(self.buffer, 1)) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=run, args=(iter(self.source()), queues[0]), daemon=True)]
+        for stage, inp, out in zip(self.stages, queues[:-1], queues[1:]):
+            threads.append(threading.Thread(target=run, args=(stage(drain(inp)), out),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            yield from drain(queues[-1])
+        finally:
+            stop.set()
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def to_list(self):
+        return list(self)
+
+    def foreach(self, fn):
+        """Call fn on every element.
+
+        Returns:
+            int: number of elements
+        """
+        n = 0
+        for x in self:
+            fn(x)
+            n += 1
+        return n
+
+    def to_jsonl(self, path):
+        """Write the documents as JSON lines.
+
+        Returns:
+            int: number of documents written
+        """
+        n = 0
+        with open(path, "w") as f:
+            for chunk in self.iter_chunks():
+                lines = [json.dumps(doc, cls=NumpyJSONENncoder) for doc in documents(chunk)]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                n += len(lines)
+        return n
+
+    def to_parquet(self, path, row_group_size=65536, compression="snappy", schema=None,
+                   fields=None):
+        """Write the documents to a parquet file, row groups are written
+        as they fill up.
+
+        Args:
+            path (str): file to write
+            row_group_size (int, optional): rows per row group. Defaults to 65536.
+            compression (str, optional): parquet compression codec. Defaults to "snappy".
+            schema (dict, optional): Eve schema of the documents. Defaults to the
+                        schema of the resource the stream was created from.
+            fields (list, optional): columns to write. Defaults to the table fields
+                        of the resource.
+
+        Returns:
+            int: number of rows written
+        """
+        from .arrow_io import arrow_schema, import_pyarrow, to_record_batch
+
+        pa = import_pyarrow()
+        import pyarrow.parquet as pq
+
+        if schema is None:
+            if self.resource is None:
+                raise ValueError("A schema is required for streams not created from a resource.")
+            schema = self.resource.schema
+        if fields is None:
+            fields = self.resource.table_fields if self.resource is not None else list(schema)
+        table_schema = arrow_schema(schema, fields)
+        nrows = 0
+        buffered = []
+        with pq.ParquetWriter(path, table_schema, compression=compression) as writer:
+            for chunk in self.iter_chunks():
+                buffered.extend(documents(chunk))
+                while len(buffered) >= row_group_size:
+                    batch = to_record_batch(buffered[:row_group_size], schema, fields)
+                    writer.write_table(pa.Table.from_batches([batch], schema=table_schema))
+                    nrows += batch.num_rows
+                    buffered = buffered[row_group_size:]
+            if buffered:
+                batch = to_record_batch(buffered, schema, fields)
+                writer.write_table(pa.Table.from_batches([batch], schema=table_schema))
+                nrows += batch.num_rows
+        return nrows
+
+    def insert_into(self, resource, batch_size=1000, validate=True, on_batch=None):
+        """Insert the documents into resource, batch_size documents per request.
+        Fields outside the target schema, e.g. the _id, _etag and _links
+        of documents read from a resource, are dropped before inserting.
+        Only counts are kept, per batch results are handed to on_batch.
+
+        Args:
+            resource (EveResource): target resource
+            batch_size (int, optional): documents per insert. Defaults to 1000.
+            validate (bool, optional): validate against the target schema. Defaults to True.
+            on_batch (callable, optional): called with the inserted, rejected and
+                        rejection reasons of each batch.
+
+        Returns:
+            tuple[int, int]: number of inserted and rejected documents
+        """
+        ninserted = nrejected = 0
+        batch = []
+
+        def flush():
+            nonlocal ninserted, nrejected
+            inserted, rejected, errors = resource.insert_documents(
+                resource.filter_fields(batch), validate=validate)
+            ninserted += len(inserted)
+            nrejected += len(rejected)
+            if on_batch is not None:
+                on_batch(inserted, rejected, errors)
+
+        for chunk in self.iter_chunks():
+            for doc in documents(chunk):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    flush()
+                    batch = []
+        if batch:
+            flush()
+        return ninserted, nrejected
@@ -1,7 +1,12 @@
+import importlib.util
+
 import param
 from bson import objectid
 import numpy as np
 import base64
+from datetime import datetime
+
+from .columnar import EVE_DATE_FORMAT
 
 class CoerceClassSelector(param.ClassSelector):
     def __set__(self, obj, val):
@@ -18,6 +23,10 @@ def objectid_param(**kwargs):
 def bytes_param(**kwargs):
     return param.ClassSelector(bytes, **kwargs)
 
+def media_param(**kwargs):
+    from .media import MediaHandle
+    return param.ClassSelector((bytes, MediaHandle), **kwargs)
+
 def set_param(**kwargs):
     return param.ClassSelector(set, **kwargs)
 
@@ -35,7 +44,7 @@ TYPE_MAPPING = {
     "number": param.Number,
     "set": set_param,
     "string": param.String,
-    "media": bytes_param,
+    "media": media_param,
 }
 
 DASK_TYPE_MAPPING = {
@@ -79,9 +88,24 @@ COERCERS = {
     "media": base64_to_binary,
 }
 
-try:
+def parse_eve_date(x):
+    if isinstance(x, str):
+        try:
+            return datetime.strptime(x, EVE_DATE_FORMAT)
+        except ValueError:
+            return x
+    return x
+
+RECORD_DECODERS = {
+    "media": base64_to_binary,
+    "datetime": parse_eve_date,
+    "date": parse_eve_date,
+}
+
+def to_datetime(x):
     import pandas as pd
-    COERCERS["date"] = pd.to_datetime
-    COERCERS["datetime"] = pd.to_datetime
-except ImportError:
-    pass
\ No newline at end of file
+    return pd.to_datetime(x)
+
+if importlib.util.find_spec("pandas") is not None:
+    COERCERS["date"] = to_datetime
+    COERCERS["datetime"] = to_datetime
@@ -1,8 +1,12 @@
 import numpy as np
 import json
+import hashlib
+from datetime import datetime
 from functools import wraps
 import re
 
+from .columnar import EVE_DATE_FORMAT
+
 url_regex = re.compile(
         r'^(?:http|ftp)s?://' # http:// or https://
         r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' #domain...
@@ -14,6 +18,27 @@ url_regex = re.compile(
 def is_valid_url(url):
     return re.match(url_regex, url) is not None
 
+def has_next_page(data, page=1):
+    """Whether an Eve listing response has pages after page.
+    The next link decides when the server sends links, otherwise the total
+    and the page size reported in _meta, which may be smaller than the one
+    requested when the server caps it with PAGINATION_LIMIT. Without either
+    the listing ends on an empty page.
+    """
+    links = data.get("_links")
+    if isinstance(links, dict):
+        return "next" in links
+    meta = data.get("_meta") or {}
+    if "total" in meta and meta.get("max_results"):
+        return page * int(meta["max_results"]) < int(meta["total"])
+    return bool(data.get("_items"))
+
+def schema_hash(schema):
+    """Stable hash of a schema definition, used as a cache key for generated classes.
+    """
+    data = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
 def requires_login(method):
     @wraps(method)
     def wrapper(self, *args, **kwargs):
@@ -33,6 +58,8 @@ def to_json_compliant(obj):
         return obj
 class NumpyJSONENncoder(json.JSONEncoder):
     def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.strftime(EVE_DATE_FORMAT)
         obj = to_json_compliant(obj)
         return super(NumpyJSONENncoder, self).default(obj)
 
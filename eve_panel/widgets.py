@@ -7,6 +7,16 @@ import param
 from eve.io.mongo.validation import Validator
 from panel.widgets import LiteralInput
 
+from .settings import config as settings
+from .utils import schema_hash
+
+_WIDGET_CLASSES = {}
+
+
+class DefaultLayout(pn.GridBox):
+    ncols = param.Integer(max(1, int(settings.GUI_WIDTH / 200)))
+    width = param.Integer(settings.GUI_WIDTH)
+
 
 class LiteralSchemaInputBase(LiteralInput):
     """[summary]
@@ -36,6 +46,13 @@ class LiteralSchemaInputBase(LiteralInput):
 
 
 def LiteralSchemaInput(name, schema, type_=None):
+    key = (name, schema_hash(schema), type_)
+    if key not in _WIDGET_CLASSES:
+        _WIDGET_CLASSES[key] = _make_literal_schema_input(name, schema, type_)
+    return _WIDGET_CLASSES[key]
+
+
+def _make_literal_schema_input(name, schema, type_=None):
     validator = Validator({"value": schema})
 
     def validate_schema(self, value):
@@ -87,6 +104,32 @@ def get_widget(name, schema):
     else:
         return WIDGET_MAPPING.get(schema.get('type', 'string'), None)
 
+def item_widgets(name, schema):
+    """Widget overrides for the fields of an item schema.
+
+    Args:
+        name (str): Name of the item class
+        schema (dict): Eve schema of the item
+
+    Returns:
+        dict: widget specs by field name, as accepted by pn.Param
+    """
+    widgets = {
+        "_etag": {
+            "type": pn.widgets.TextInput,
+            "disabled": True
+        },
+        "_version": {
+            "type": pn.widgets.IntInput,
+            "disabled": False
+        }
+    }
+    for field_name, field_schema in schema.items():
+        widget = get_widget(f"{name.title()}{field_name.title()}", field_schema)
+        if widget is not None:
+            widgets[field_name] = widget
+    return widgets
+
 class Progress(param.Parameterized):
     value = param.Integer(0)
     total = param.Integer(100)
@@ -3,10 +3,14 @@ Tasks for maintaining the project.
 
 Execute 'invoke --list' for guidance on using Invoke
 """
+import json
 import shutil
 import platform
+import shlex
+import sys
 
 from invoke import task
+from invoke.exceptions import Exit
 from pathlib import Path
 import webbrowser
 
@@ -23,6 +27,14 @@ DOCS_DIR = ROOT_DIR.joinpath("docs")
 DOCS_BUILD_DIR = DOCS_DIR.joinpath("_build")
 DOCS_INDEX = DOCS_BUILD_DIR.joinpath("index.html")
 PYTHON_DIRS = [str(d) for d in [SOURCE_DIR, TEST_DIR]]
+GUI_MODULES = ["panel", "bokeh", "holoviews", "eve", "tqdm"]
+IMPORT_BENCH = """
+import json, sys, time
+t0 = time.perf_counter()
+import eve_panel
+elapsed = time.perf_counter() - t0
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
 
 
 def _delete_file(file):
@@ -86,6 +98,26 @@ def test(c):
     _run(c, "pytest")
 
 
+@task(help={'budget': "Maximum import time in seconds",
+            'repeat': "Number of fresh interpreters to time"})
+def bench_import(c, budget=1.0, repeat=5):
+    """
+    Benchmark import time of the data API and check no GUI modules are loaded
+    """
+    script = IMPORT_BENCH % GUI_MODULES
+    results = []
+    for _ in range(int(repeat)):
+        out = c.run(f"{sys.executable} -c {shlex.quote(script)}", hide=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    best = min(r["elapsed"] for r in results)
+    loaded = sorted(set(m for r in results for m in r["loaded"]))
+    print(f"import eve_panel: best of {repeat} = {best:.3f}s (budget {float(budget):.3f}s)")
+    if loaded:
+        raise Exit(f"GUI modules imported by the data API: {', '.join(loaded)}")
+    if best > float(budget):
+        raise Exit(f"Import time {best:.3f}s exceeds budget of {float(budget):.3f}s")
+
+
 @task(help={'publish': "Publish the result via coveralls"})
 def coverage(c, publish=False):
     """
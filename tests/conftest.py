@@ -0,0 +1,150 @@
+"""Fixtures serving a resource from an in process fake Eve server."""
+
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from eve_panel.columnar import EVE_DATE_FORMAT
+from eve_panel.query import match
+
+SCHEMA = {
+    "name": {"type": "string"},
+    "age": {"type": "integer", "min": 0},
+    "score": {"type": "float"},
+    "when": {"type": "datetime"},
+}
+
+DOMAIN = {
+    "people": {"url": "people", "item_title": "person", "resource_title": "people",
+               "schema": SCHEMA},
+}
+
+PYTHON_WHERE = re.compile(r"^\s*(\w+)\s*==\s*(\S+)\s*$")
+
+
+def make_docs(n):
+    base = datetime(2021, 1, 1)
+    docs = []
+    for i in range(n):
+        stamp = (base + timedelta(hours=i)).strftime(EVE_DATE_FORMAT)
+        docs.append({
+            "_id": f"{i:024x}",
+            "name": f"n{i}",
+            "age": i % 10,
+            "score": i * 0.5,
+            "when": stamp,
+            "_etag": hashlib.md5(str(i).encode()).hexdigest(),
+            "_updated": stamp,
+            "_created": base.strftime(EVE_DATE_FORMAT),
+        })
+    return docs
+
+
+class FakeEve:
+    """Eve like server for one resource.
+
+    Args:
+        docs (list): documents of the resource
+        pagination_limit (int, optional): largest page size served, like Eve's
+                    PAGINATION_LIMIT.
+    """
+
+    def __init__(self, docs, pagination_limit=None):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.pagination_limit = pagination_limit
+        self.requests = []
+
+    def where(self, value):
+        if not value:
+            return lambda doc: True
+        try:
+            query = json.loads(value)
+        except ValueError:
+            # python syntax, only field == literal
+            field, literal = PYTHON_WHERE.match(value).groups()
+            literal = json.loads(literal)
+            return lambda doc: doc.get(field) == literal
+        return lambda doc: match(doc, query)
+
+    def listing(self, params):
+        docs = [doc for doc in self.docs.values() if self.where(params.get("where"))(doc)]
+        for key in reversed([k for k in params.get("sort", "").split(",") if k]):
+            name = key.lstrip("-")
+            docs.sort(key=lambda doc: doc.get(name), reverse=key.startswith("-"))
+        max_results = int(params.get("max_results", 25))
+        if self.pagination_limit:
+            max_results = min(max_results, self.pagination_limit)
+        page = int(params.get("page", 1))
+        items = docs[(page - 1) * max_results:page * max_results]
+        links = {"self": {"href": "people"}}
+        if page * max_results < len(docs):
+            links["next"] = {"href": f"people?page={page + 1}"}
+        return {"_items": items, "_links": links,
+                "_meta": {"total": len(docs), "page": page, "max_results": max_results}}
+
+    def handler(self, request):
+        self.requests.append(request)
+        path = request.url.path.strip("/")
+        params = dict(request.url.params)
+        if path == "domain":
+            return httpx.Response(200, json=DOMAIN)
+        parts = path.split("/")
+        if len(parts) == 2:
+            doc = self.docs.get(parts[1])
+            if request.method == "GET":
+                return httpx.Response(200 if doc else 404, json=doc or {})
+            doc = self.docs.setdefault(parts[1], {"_id": parts[1]})
+            doc.update(json.loads(request.content or b"{}"))
+            doc["_etag"] = hashlib.md5(json.dumps(doc).encode()).hexdigest()
+            return httpx.Response(200, json={"_id": doc["_id"], "_etag": doc["_etag"],
+                                             "_status": "OK"})
+        if request.method == "POST":
+            body = json.loads(request.content)
+            body = body if isinstance(body, list) else [body]
+            for doc in body:
+                doc["_id"] = f"{len(self.docs):024x}"
+                self.docs[doc["_id"]] = doc
+            return httpx.Response(201, json={"_status": "OK", "_items": [
+                {"_id": doc["_id"], "_status": "OK"} for doc in body]})
+        return httpx.Response(200, json=self.listing(params))
+
+    def listings(self):
+        """Listing requests received so far."""
+        return [r for r in self.requests
+                if r.method == "GET" and r.url.path.strip("/") == "people"]
+
+
+def serve(server):
+    from eve_panel.resource import EveResource
+    from eve_panel.session import EveSession
+
+    session = EveSession(known_servers={"local": "http://testserver"})
+    session.server_url = "http://testserver"
+    session.extra_client_kwargs = {"transport": httpx.MockTransport(server.handler)}
+    return EveResource.from_resource_def(DOMAIN["people"], "people", session=session)
+
+
+@pytest.fixture
+def server():
+    return FakeEve(make_docs(95))
+
+
+@pytest.fixture
+def resource(server):
+    return serve(server)
+
+
+@pytest.fixture
+def capped_server():
+    return FakeEve(make_docs(95), pagination_limit=7)
+
+
+@pytest.fixture
+def capped_resource(capped_server):
+    resource = serve(capped_server)
+    resource.items_per_page = 10
+    return resource
@@ -0,0 +1,25 @@
+"""Tests for the arrow and parquet readers of resources."""
+
+import pyarrow.parquet as pq
+
+
+def test_to_parquet_row_groups(capped_resource, tmp_path):
+    path = str(tmp_path / "people.parquet")
+    assert capped_resource.to_parquet(path, row_group_size=25) == 95
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_rows == 95
+    assert metadata.num_row_groups == 4
+    sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    assert sizes == [25, 25, 25, 20]
+
+
+def test_to_arrow_under_pagination_limit(capped_resource):
+    table = capped_resource.to_arrow()
+    assert table.num_rows == 95
+    assert len(set(table.column("_id").to_pylist())) == 95
+
+
+def test_to_dataframe_under_pagination_limit(capped_resource):
+    df = capped_resource.to_dataframe()
+    assert len(df) == 95
+    assert df.index.is_unique
@@ -0,0 +1,30 @@
+"""Tests for clients built from a domain definition."""
+
+from eve_panel.eve_client import EveClient, ResourceHandle
+
+from .conftest import DOMAIN
+
+SUB_DOMAIN = dict(DOMAIN, **{
+    "shop/orders": {"url": "shop/orders", "item_title": "order", "resource_title": "orders",
+                    "schema": {"total": {"type": "float"}}},
+})
+
+
+def built(client):
+    return {k: v.is_built(client) for k, v in client.param.objects().items()
+            if hasattr(v, "is_built")}
+
+
+def test_resources_are_not_built():
+    client = EveClient.from_domain_def(SUB_DOMAIN, "test")
+    resources = client.resources
+    assert isinstance(resources["people"], ResourceHandle)
+    assert not any(built(client).values())
+    assert client.resource_tree["people"].name == "people"
+    assert not any(built(client).values())
+    assert not any(built(client.shop).values())
+
+    # opening a handle builds only that resource
+    assert resources["people"].resource is client.people
+    assert built(client) == {"people": True}
+    assert client.resources["people"] is client.people
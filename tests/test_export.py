@@ -0,0 +1,46 @@
+"""Tests for resumable exports."""
+
+import json
+import os
+
+from eve_panel.export import CHECKPOINT_FILE, export_resource
+
+
+def read_jsonl(paths):
+    rows = []
+    for path in paths:
+        with open(path) as f:
+            rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+def test_pages_follow_server_page_size(capped_resource):
+    # the server serves at most 7 documents per page for items_per_page=10
+    ids = [doc["_id"] for page in capped_resource.pages_raw(cache_result=False)
+           for doc in page]
+    assert len(ids) == 95
+    assert len(set(ids)) == 95
+
+
+def test_export_under_pagination_limit(capped_resource, tmp_path):
+    paths = export_resource(capped_resource, str(tmp_path), format="jsonl", pages_per_file=4)
+    assert len(read_jsonl(paths)) == 95
+    with open(os.path.join(tmp_path, CHECKPOINT_FILE)) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["nrows"] == 95
+    assert checkpoint["complete"]
+
+
+def test_export_incomplete_is_not_marked_complete(capped_resource, capped_server, tmp_path):
+    # a document deleted after the export read the total is never written
+    pages_raw = capped_resource.pages_raw
+
+    def deleting(*args, **kwargs):
+        capped_server.docs.pop("0" * 24)
+        yield from pages_raw(*args, **kwargs)
+
+    capped_resource.pages_raw = deleting
+    paths = export_resource(capped_resource, str(tmp_path), format="jsonl")
+    assert len(read_jsonl(paths)) == 94
+    with open(os.path.join(tmp_path, CHECKPOINT_FILE)) as f:
+        assert not json.load(f)["complete"]
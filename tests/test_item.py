@@ -0,0 +1,19 @@
+"""Tests for items of a resource."""
+
+import pytest
+
+
+def test_make_item_validates(resource):
+    item = resource.make_item(name="x", age=3)
+    assert item.age == 3
+    with pytest.raises(ValueError):
+        resource.make_item(name="x", age=-1)
+
+
+def test_server_documents_are_trusted(resource, server):
+    doc = server.docs["0" * 24]
+    doc["age"] = -1
+    assert resource["0" * 24].age == -1
+    assert resource.find_one_item(query={"_id": doc["_id"]}).age == -1
+    page = resource.make_page([doc], page_number=1)
+    assert page[doc["_id"]].age == -1
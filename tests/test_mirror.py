@@ -0,0 +1,41 @@
+"""Tests for local copies of resources."""
+
+import json
+
+import pytest
+
+from eve_panel.exceptions import UnsupportedQuery
+from eve_panel.mirror import MemoryStore, SQLiteStore
+
+from .conftest import SCHEMA, make_docs
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request):
+    store = MemoryStore() if request.param == "memory" else SQLiteStore(SCHEMA)
+    store.upsert(make_docs(20))
+    return store
+
+
+def test_store_query(store):
+    resp = store.query(where={"age": 3}, max_results=10)
+    assert [doc["age"] for doc in resp["_items"]] == [3, 3]
+    assert resp["_meta"]["total"] == 2
+
+
+def test_store_rejects_python_where(store):
+    with pytest.raises(UnsupportedQuery):
+        store.query(where="age == 3")
+
+
+def test_sync_keeps_updated_filter(resource, server):
+    store = MemoryStore()
+    resource.sync(store)
+    assert len(store) == 95
+
+    cutoff = store.get_state("_updated")
+    resource.filters = {"_updated": {"$lte": cutoff}}
+    resource.sync(store)
+    where = json.loads(server.listings()[-1].url.params["where"])
+    assert {"_updated": {"$lte": cutoff}} in where["$and"]
+    assert {"_updated": {"$gte": cutoff}} in where["$and"]
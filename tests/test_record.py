@@ -0,0 +1,23 @@
+"""Tests for lightweight records."""
+
+import json
+from datetime import datetime
+
+
+def test_records_decode_by_schema(resource, server):
+    page = next(resource.pages(lightweight=True))
+    record = page["0" * 24]
+    assert record.when == datetime(2021, 1, 1)
+    assert record.age == 0
+    assert record._id == "0" * 24
+    assert record.to_dict()["when"] == datetime(2021, 1, 1)
+
+
+def test_record_push_encodes_dates(resource, server):
+    doc = server.docs["1" * 24] = dict(server.docs["0" * 24], _id="1" * 24)
+    record = resource.make_record(**doc)
+    record.age = 5
+    record.push()
+    body = json.loads(server.requests[-1].content)
+    assert body["when"] == doc["when"]
+    assert server.docs["1" * 24]["age"] == 5
@@ -0,0 +1,36 @@
+"""Tests for the result cache of resource GETs."""
+
+import asyncio
+
+
+def test_python_where_after_full_fetch(resource, server):
+    # a complete cached result set answers refinements of Mongo queries locally
+    resource.find(max_results=100)
+    nrequests = len(server.listings())
+    assert len(resource.find(query={"age": 3}, max_results=100)) == 10
+    assert len(server.listings()) == nrequests
+
+    # python syntax queries are sent to the server
+    docs = resource.find(query="age == 3", max_results=100)
+    assert len(docs) == 10
+    assert all(doc["age"] == 3 for doc in docs)
+    assert len(server.listings()) == nrequests + 1
+
+
+def test_partial_page_fill(resource, server):
+    # a larger page after a smaller one only fetches the missing documents
+    resource.get(max_results=10, page=1)
+    nrequests = len(server.listings())
+    data = resource.get(max_results=20, page=1)
+    assert [doc["_id"] for doc in data["_items"]] == sorted(server.docs)[:20]
+    fills = server.listings()[nrequests:]
+    assert [(r.url.params["page"], r.url.params["max_results"]) for r in fills] == [("2", "10")]
+
+
+def test_partial_page_fill_async(resource, server):
+    resource.get(max_results=10, page=1)
+    nrequests = len(server.listings())
+    data = asyncio.run(resource.get_async(max_results=20, page=1))
+    assert [doc["_id"] for doc in data["_items"]] == sorted(server.docs)[:20]
+    fills = server.listings()[nrequests:]
+    assert [(r.url.params["page"], r.url.params["max_results"]) for r in fills] == [("2", "10")]